@@ -3,3 +3,9 @@
 
 
 from parallel_utils.common.abstract_monitor import AbstractMonitor
+from parallel_utils.common.profiler import Profiler
+from parallel_utils.common.deadlock import DeadlockDetector
+from parallel_utils.common.abstract_channel import AbstractChannel, ChannelClosed
+from parallel_utils.common.spin import AdaptiveSpin
+from parallel_utils.common.uid_state import ShardedUidStates, UidState, UidStates, shard_of
+from parallel_utils.common.abstract_task_group import AbstractTaskGroup, TaskGroupError
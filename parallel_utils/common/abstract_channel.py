@@ -0,0 +1,81 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+from abc import ABC, abstractmethod
+from queue import Empty, Full
+from typing import Any, Iterable, Iterator, List
+
+
+class ChannelClosed(Exception):
+    '''
+    Raised when putting items into a closed channel, or when getting items from a closed channel that has been drained.
+    '''
+
+
+class AbstractChannel(ABC):
+    '''
+    An abstract bounded channel to pass items between threads or processes. Producers block while the channel is full,
+    so a slow consumer throttles its producers without any other synchronization.
+    '''
+
+    @abstractmethod
+    def put_many(self, items: Iterable[Any], timeout: float = None) -> int:
+        '''
+        Puts the items into the channel, in order, blocking while it is full.
+        :param items: The items to put.
+        :param timeout: Maximum number of seconds to block. None blocks until every item is put, and 0 never blocks.
+        :return: The number of items put, which is less than the number of items if the timeout expired or the channel
+        was closed meanwhile. Items not counted were not put, so they can be safely retried.
+        '''
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_many(self, max_items: int, timeout: float = None) -> List[Any]:
+        '''
+        Gets up to max_items items from the channel, blocking until there is at least one.
+        :param max_items: Maximum number of items to get.
+        :param timeout: Maximum number of seconds to block. None blocks until there is an item, and 0 never blocks.
+        :return: The items, or an empty list if the timeout expired.
+        '''
+        raise NotImplementedError
+
+    @abstractmethod
+    def close(self):
+        '''
+        Closes the channel. Items can't be put anymore, but the ones already put can still be got.
+        '''
+        raise NotImplementedError
+
+    def put(self, item: Any, timeout: float = None):
+        '''
+        Puts an item into the channel, blocking while it is full.
+        :param item: The item to put.
+        :param timeout: Maximum number of seconds to block. None blocks until the item is put, and 0 never blocks.
+        '''
+        if self.put_many((item,), timeout) == 0:
+            raise Full
+
+    def get(self, timeout: float = None) -> Any:
+        '''
+        Gets an item from the channel, blocking while it is empty.
+        :param timeout: Maximum number of seconds to block. None blocks until there is an item, and 0 never blocks.
+        :return: The item.
+        '''
+        items = self.get_many(1, timeout)
+        if not items:
+            raise Empty
+        return items[0]
+
+    def __iter__(self) -> Iterator[Any]:
+        try:
+            while True:
+                yield self.get()
+        except ChannelClosed:
+            return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -3,8 +3,10 @@
 
 
 from abc import ABC, abstractmethod
-from contextlib import contextmanager
-from typing import Union
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Iterable, List, Union
+
+from parallel_utils.common.profiler import Profiler
 
 
 class AbstractMonitor(ABC):
@@ -13,12 +15,17 @@ class AbstractMonitor(ABC):
     '''
 
     @abstractmethod
-    def lock_code(self, uid: Union[str, int], max_threads: int):
+    def lock_code(self, uid: Union[str, int], max_threads: int, weight: int = 1):
         '''
         Only allow up to max_threads threads to enter the code included between this function and
         the 'unlock_code()' function.
         :param uid: Unique identifier for the code snippet.
-        :param max_threads: Maximum number of threads that can access the code simultaneously.
+        :param max_threads: Maximum number of threads that can access the code simultaneously, or, with weights, the
+        number of permits of the uid.
+        :param weight: Number of permits to take at once, which must be released with the same weight. Threads that
+        have to wait are served in arrival order, so heavy ones aren't starved by lighter ones.
+        :return: Process monitors return OWNER_DIED instead of LOCKED when a previous holder of the uid died while
+        holding it, so the data it protects may have been left half updated.
         '''
         raise NotImplementedError
 
@@ -30,40 +37,175 @@ class AbstractMonitor(ABC):
         :param uid: Unique identifier for the set of code snippets.
         :param order: The priority of the code protected with this function's uid.
         :param total: The total number of pieces of code to synchronize with this function's uid.
+        :return: The same as 'lock_code'.
         '''
         raise NotImplementedError
 
     @abstractmethod
-    def unlock_code(self, uid: Union[str, int]):
+    def unlock_code(self, uid: Union[str, int], weight: int = 1):
         '''
         Sets the limit to where a piece of code is locked with 'lock_code' or 'lock_priority_code' methods.
         :param uid: Unique identifier of the 'lock_code' or 'lock_priority_code' function.
+        :param weight: Number of permits to release, the same that were taken.
+        '''
+        raise NotImplementedError
+
+    @abstractmethod
+    def enable_deadlock_detection(self, timeout: float = 5, on_deadlock: Callable[[str], Any] = None):
+        '''
+        Enables the debug mode, which reports every thread that has been waiting for a uid for longer than 'timeout'
+        seconds, along with what every other thread holds and waits for. It also reports calls with a 'total' that
+        doesn't match the one the uid was set up with. It should be enabled before the monitor is used.
+        :param timeout: Number of seconds a thread can wait on a uid before being reported.
+        :param on_deadlock: A function called with every report. By default, reports are logged to the
+        'parallel_utils' logger. With process monitors, it is pickled to every process that uses the monitor and called
+        in the process that finds the deadlock, so it must be a module-level function, not a lambda or a closure, and it
+        can't just fill an object of the calling process, like a plain list, which would only fill a copy of it.
+        '''
+        raise NotImplementedError
+
+    @abstractmethod
+    def disable_deadlock_detection(self):
+        '''
+        Disables the debug mode enabled by 'enable_deadlock_detection'.
         '''
         raise NotImplementedError
 
+    @abstractmethod
+    def enable_spinning(self, max_spins: int = 100, max_hold: float = 0.0001):
+        '''
+        Before blocking, threads will try to take a uid up to max_spins times, yielding the CPU between tries. This
+        avoids parking threads on very short critical sections. The number of tries of every uid adapts to the time its
+        code has recently been held, so long sections quickly stop spinning.
+        :param max_spins: Maximum number of tries before blocking.
+        :param max_hold: Average hold time, in seconds, above which spinning is not worth it.
+        '''
+        raise NotImplementedError
+
+    @abstractmethod
+    def disable_spinning(self):
+        '''
+        Disables the spinning enabled by 'enable_spinning'.
+        '''
+        raise NotImplementedError
+
+    @abstractmethod
+    def enable_profiling(self, capacity: int = 65536, directory: str = None) -> Profiler:
+        '''
+        Records, for every uid, how long each worker waits for it and how long it holds it, so that the serialization
+        points of a run can be seen in a trace viewer like Perfetto.
+        :param capacity: Maximum number of spans kept per process. The oldest ones are dropped first.
+        :param directory: A directory where every process writes its spans when it exits, to be merged later with
+        'Profiler.merge'. None doesn't write them.
+        :return: The profiler of the current process, whose 'export' method returns its spans as a Chrome trace.
+        '''
+        raise NotImplementedError
+
+    @abstractmethod
+    def disable_profiling(self):
+        '''
+        Disables the profiling enabled by 'enable_profiling'.
+        '''
+        raise NotImplementedError
+
+    @abstractmethod
+    async def acquire_async(self, uid: Union[str, int], max_threads: int = 1, weight: int = 1):
+        '''
+        Same as 'lock_code', but awaitable from an event loop without blocking it. The code must be unlocked with
+        'unlock_code' as usual.
+        :param uid: Unique identifier for the code snippet.
+        :param max_threads: Maximum number of threads that can access the code simultaneously.
+        :param weight: Number of permits to take at once. The coroutine waits its turn in arrival order along with
+        threads, as 'lock_code' does.
+        :return: The same as 'lock_code'.
+        '''
+        raise NotImplementedError
+
+    @staticmethod
+    def canonical_order(uids: Iterable[Union[str, int]]) -> List[Union[str, int]]:
+        '''
+        Sorts a set of uids in the global order every 'lock_many' call follows: integers first, then strings.
+        :param uids: The uids to sort.
+        '''
+        return sorted(set(uids), key=lambda uid: (isinstance(uid, str), uid))
+
+    def lock_many(self, uids: Iterable[Union[str, int]], max_threads: int = 1):
+        '''
+        Calls 'lock_code' for every uid, always in the same global order, no matter the order they're given in.
+        Therefore, two threads locking overlapping sets of uids can never deadlock each other, unlike nested
+        'lock_code' calls.
+        :param uids: Unique identifiers for the code snippet.
+        :param max_threads: Maximum number of threads that can access the code simultaneously.
+        '''
+        locked = []
+        try:
+            for uid in self.canonical_order(uids):
+                self.lock_code(uid, max_threads)
+                locked.append(uid)
+        except BaseException:
+            self.unlock_many(locked)
+            raise
+
+    def unlock_many(self, uids: Iterable[Union[str, int]]):
+        '''
+        Sets the limit to where a piece of code is locked with the 'lock_many' method.
+        :param uids: Unique identifiers of the 'lock_many' function.
+        '''
+        for uid in reversed(self.canonical_order(uids)):
+            self.unlock_code(uid)
+
     @contextmanager
-    def synchronized(self, uid: Union[str, int], max_threads: int = 1):
+    def synchronized(self, uid: Union[str, int], max_threads: int = 1, weight: int = 1):
         '''
-        Context manager for 'lock_code' function
+        Context manager for 'lock_code' function, which binds what it returned to the target of 'as'.
         :param uid: Unique identifier for the code snippet.
         :param max_threads: Maximum number of threads that can access the code simultaneously.
+        :param weight: Number of permits to take at once.
         '''
-        self.lock_code(uid, max_threads)
+        status = self.lock_code(uid, max_threads, weight)
         try:
-            yield
+            yield status
         finally:
-            self.unlock_code(uid)
+            self.unlock_code(uid, weight)
 
     @contextmanager
     def synchronized_priority(self, uid: Union[str, int], order: int, total: int = None):
         '''
-        Context manager for 'lock_priority_code' function
+        Context manager for 'lock_priority_code' function, which binds what it returned to the target of 'as'.
         :param uid: Unique identifier for the set of code snippets.
         :param order: The priority of the code protected with this function's uid.
         :param total: The total number of pieces of code to synchronize with this function's uid.
         '''
-        self.lock_priority_code(uid, order, total)
+        status = self.lock_priority_code(uid, order, total)
         try:
-            yield
+            yield status
         finally:
             self.unlock_code(uid)
+
+    @contextmanager
+    def synchronized_many(self, uids: Iterable[Union[str, int]], max_threads: int = 1):
+        '''
+        Context manager for 'lock_many' function
+        :param uids: Unique identifiers for the code snippet.
+        :param max_threads: Maximum number of threads that can access the code simultaneously.
+        '''
+        uids = self.canonical_order(uids)
+        self.lock_many(uids, max_threads)
+        try:
+            yield
+        finally:
+            self.unlock_many(uids)
+
+    @asynccontextmanager
+    async def synchronized_async(self, uid: Union[str, int], max_threads: int = 1, weight: int = 1):
+        '''
+        Asynchronous context manager for 'acquire_async' function, which binds what it returned to the target of 'as'.
+        :param uid: Unique identifier for the code snippet.
+        :param max_threads: Maximum number of threads that can access the code simultaneously.
+        :param weight: Number of permits to take at once.
+        '''
+        status = await self.acquire_async(uid, max_threads, weight)
+        try:
+            yield status
+        finally:
+            self.unlock_code(uid, weight)
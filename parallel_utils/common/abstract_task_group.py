@@ -0,0 +1,117 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_EXCEPTION, Future, wait
+from threading import Event
+from time import monotonic
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+
+class TaskGroupError(Exception):
+    '''
+    Raised when leaving a task group in which some tasks failed, or whose deadline expired.
+    Its 'exceptions' attribute holds the exception of every failed task, followed by a TimeoutError if the deadline
+    expired.
+    '''
+
+    def __init__(self, message: str, exceptions: Iterable[BaseException]):
+        self.message = message
+        self.exceptions = list(exceptions)
+        super().__init__(message, self.exceptions)
+
+    def __str__(self):
+        return f'{self.message} ({len(self.exceptions)} sub-exception{"" if len(self.exceptions) == 1 else "s"})'
+
+
+class AbstractTaskGroup(ABC):
+    '''
+    An abstract context manager that tracks every task created inside it, and doesn't let any of them outlive it.
+    On leaving it, it waits for all of its tasks. As soon as one of them fails, or its deadline expires, the rest of
+    them are cancelled, and every exception is raised together in a TaskGroupError.
+    Backends whose tasks can't be stopped set 'stoppable' to False: their cancelled tasks are only waited for until
+    the deadline, and those still running then are left behind.
+    '''
+
+    stoppable = True
+
+    def __init__(self, timeout: float = None):
+        '''
+        :param timeout: Maximum number of seconds the tasks can run since entering the group. None never expires.
+        '''
+        self.timeout = timeout
+        self.deadline = None
+        self.futures = []
+        # Set when the tasks are cancelled, so that running ones can check it and stop early
+        self.cancelled = Event()
+
+    @abstractmethod
+    def start_task(self, func: Callable, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Future:
+        '''
+        Starts running a function, and returns the Future of its result.
+        '''
+        raise NotImplementedError
+
+    @abstractmethod
+    def cancel_tasks(self):
+        '''
+        Stops the tasks that are still running, as far as the backend allows it.
+        '''
+        raise NotImplementedError
+
+    def create_task(self, func: Callable, *args: Any, **kwargs: Any) -> Future:
+        '''
+        Calls a function as a new task of the group
+        :param func: The function to be called
+        :param args: The function arguments
+        :param kwargs: The function keyword arguments
+        :return: The created Future object.
+        '''
+        if self.cancelled.is_set():
+            raise RuntimeError('the task group has been cancelled')
+        future = self.start_task(func, args, kwargs)
+        self.futures.append(future)
+        return future
+
+    def cancel(self):
+        '''
+        Cancels every task of the group that hasn't finished yet.
+        '''
+        if not self.cancelled.is_set():
+            self.cancelled.set()
+            self.cancel_tasks()
+
+    def __enter__(self):
+        self.deadline = None if self.timeout is None else monotonic() + self.timeout
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.cancel()
+        timed_out = False
+        while not self.cancelled.is_set():
+            pending = [f for f in self.futures if not f.done()]
+            if not pending:
+                break
+            remaining = None if self.deadline is None else self.deadline - monotonic()
+            if remaining is not None and remaining <= 0:
+                timed_out = True
+                self.cancel()
+                break
+            done, _ = wait(pending, remaining, FIRST_EXCEPTION)
+            if any(not f.cancelled() and f.exception() is not None for f in done):
+                self.cancel()
+        # Cancelled tasks are waited for too, so that none of them outlives the group, unless they can't be stopped
+        if self.stoppable or self.deadline is None:
+            wait(self.futures)
+        else:
+            _, not_done = wait(self.futures, max(0, self.deadline - monotonic()))
+            timed_out = timed_out or bool(not_done)
+        if exc_type is not None:
+            return False
+        exceptions = [f.exception() for f in self.futures if f.done() and not f.cancelled() and f.exception() is not None]
+        if timed_out:
+            exceptions.append(TimeoutError(f'the task group exceeded its timeout of {self.timeout} seconds'))
+        if exceptions:
+            raise TaskGroupError('some tasks of the group failed', exceptions)
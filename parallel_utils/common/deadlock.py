@@ -0,0 +1,158 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import logging
+import os
+import threading
+import time
+from multiprocessing import current_process
+from typing import Any, Callable, Dict, List, MutableMapping, Optional, Union
+
+logger = logging.getLogger('parallel_utils')
+
+
+def worker_id() -> str:
+    return f'{os.getpid()}:{threading.get_ident()}'
+
+
+def worker_name() -> str:
+    return f'{current_process().name}/{threading.current_thread().name}'
+
+
+class DeadlockDetector:
+    '''
+    Keeps a wait-for graph of the workers (threads or processes) that hold or wait on the uids of a Monitor, and reports
+    every worker that has been waiting for longer than 'timeout' seconds, along with the cycle it is part of, if any.
+    The mappings can be Manager proxies, so that the graph spans across processes.
+    '''
+
+    def __init__(self, timeout: float, on_deadlock: Callable[[str], Any] = None, holding: MutableMapping = None,
+                 waiting: MutableMapping = None, reported: MutableMapping = None):
+        '''
+        :param timeout: Number of seconds a worker can wait on a uid before being reported.
+        :param on_deadlock: A function called with the report. By default, it is logged to the 'parallel_utils' logger.
+        :param holding: A mapping to store what each worker holds. A plain dict by default.
+        :param waiting: A mapping to store what each worker waits for. A plain dict by default.
+        :param reported: A mapping to store the waits already reported. A plain dict by default.
+        '''
+        self.timeout = timeout
+        self.on_deadlock = on_deadlock
+        # holding = {'pid:tid': [(uid, order, name), ...]}, waiting = {'pid:tid': (uid, order, since, name)}
+        self.holding = {} if holding is None else holding
+        self.waiting = {} if waiting is None else waiting
+        self.reported = {} if reported is None else reported
+        self.watchdog_pid = None
+        self.stopped = threading.Event()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['watchdog_pid'] = None
+        del state['stopped']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.stopped = threading.Event()
+
+    def start(self):
+        '''
+        Starts, if not running yet, the watchdog thread of the current process.
+        '''
+        if self.watchdog_pid != os.getpid():
+            self.watchdog_pid = os.getpid()
+            threading.Thread(target=self.watch, name='DeadlockDetector', daemon=True).start()
+
+    def watch(self):
+        while not self.stopped.wait(self.timeout / 2):
+            self.check()
+
+    def stop(self):
+        '''
+        Stops the watchdog thread of the current process, once the detector is not used anymore.
+        '''
+        self.stopped.set()
+
+    def waiting_for(self, uid: Union[str, int], order: int):
+        self.start()
+        self.waiting[worker_id()] = (uid, order, time.time(), worker_name())
+
+    def acquired(self, uid: Union[str, int], order: int):
+        worker = worker_id()
+        self.waiting.pop(worker, None)
+        self.holding[worker] = self.holding.get(worker, []) + [(uid, order, worker_name())]
+
+    def released(self, uid: Union[str, int]):
+        holding = dict(self.holding)
+        # A permit can be released by a worker other than the one that took it
+        for worker in [worker_id()] + list(holding.keys()):
+            held = list(holding.get(worker, []))
+            for i in reversed(range(len(held))):
+                if held[i][0] == uid:
+                    del held[i]
+                    if held:
+                        self.holding[worker] = held
+                    else:
+                        self.holding.pop(worker, None)
+                    return
+
+    def misuse(self, message: str):
+        self.report(f'Monitor misuse by {worker_name()}: {message}')
+
+    def report(self, message: str):
+        if self.on_deadlock is not None:
+            self.on_deadlock(message)
+        else:
+            logger.error(message)
+
+    def find_cycle(self, start: str, edges: Dict[str, List[str]]) -> Optional[List[str]]:
+        stack, visited = [(start, [start])], set()
+        while stack:
+            worker, path = stack.pop()
+            for holder in edges.get(worker, []):
+                if holder == start:
+                    return path + [start]
+                if holder not in visited:
+                    visited.add(holder)
+                    stack.append((holder, path + [holder]))
+        return None
+
+    def check(self) -> Optional[str]:
+        '''
+        Looks for workers that have been waiting for too long and reports them.
+        :return: The report, or None if nothing was found.
+        '''
+        holding, waiting, now = dict(self.holding), dict(self.waiting), time.time()
+        holders = {}
+        for worker, held in holding.items():
+            for uid, _, _ in held:
+                holders.setdefault(uid, []).append(worker)
+        edges = {worker: holders.get(uid, []) for worker, (uid, _, _, _) in waiting.items()}
+        stalled = [worker for worker, (_, _, since, _) in waiting.items()
+                   if now - since >= self.timeout and self.reported.get(worker) != since]
+        if not stalled:
+            return None
+        names = {worker: held[-1][2] for worker, held in holding.items() if held}
+        names.update({worker: name for worker, (_, _, _, name) in waiting.items()})
+        lines = [f'Possible deadlock detected, workers waiting for more than {self.timeout}s:']
+        for worker in stalled:
+            uid, order, since, name = waiting[worker]
+            self.reported[worker] = since
+            cycle = self.find_cycle(worker, edges)
+            if cycle is not None:
+                lines.append(f'  cycle: {" -> ".join(names.get(w, w) for w in cycle)}')
+            elif not holders.get(uid):
+                lines.append(f'  stalled priority chain: nobody holds uid {uid!r}, so {name} is waiting for an earlier '
+                             f'order or for the call that sets the total')
+        for worker in set(waiting) | set(holding):
+            name = names.get(worker, worker)
+            held = ', '.join(f'uid {uid!r} (order {order})' for uid, order, _ in holding.get(worker, []))
+            if worker in waiting:
+                uid, order, since, name = waiting[worker]
+                line = f'  {name} ({worker}) waits for uid {uid!r} (order {order}) since {now - since:.1f}s'
+                lines.append(f'{line} and holds {held}' if held else line)
+            else:
+                lines.append(f'  {name} ({worker}) holds {held}')
+        message = '\n'.join(lines)
+        self.report(message)
+        return message
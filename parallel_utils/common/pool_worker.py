@@ -0,0 +1,28 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import os
+from importlib import import_module
+from typing import Any, Callable, Optional, Sequence
+
+
+# The functions run by the workers of a ProcessPool live out of parallel_utils.process, since importing that package
+# starts the managers of its monitors, which every worker would start again just to unpickle its initializer.
+
+
+def init_worker(preload: Sequence[str], initializer: Optional[Callable], initargs: Sequence[Any]):
+    '''
+    Runs once in every worker process, right after it starts.
+    :param preload: Names of the modules to import before calling the initializer.
+    :param initializer: A user function that loads the state needed by the tasks.
+    :param initargs: The initializer arguments.
+    '''
+    for module in preload:
+        import_module(module)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def ping() -> int:
+    return os.getpid()
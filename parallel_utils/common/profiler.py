@@ -0,0 +1,126 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import json
+import os
+import threading
+from collections import deque
+from multiprocessing import current_process
+from multiprocessing.util import Finalize
+from time import time_ns
+from typing import Any, Dict, List, Union
+
+
+class Profiler:
+    '''
+    Records how long every worker waits for the uids of a Monitor, and how long it then holds them, as spans in a ring
+    buffer of the current process. Spans can be exported in the Chrome trace event format, which both Perfetto and
+    chrome://tracing can open. Every process records its own spans; if a directory is given, every process writes them
+    to its own file there when it exits, and 'merge' joins all of those files into a single trace.
+    '''
+
+    def __init__(self, capacity: int = 65536, directory: str = None):
+        '''
+        :param capacity: Maximum number of spans kept per process. The oldest ones are dropped first.
+        :param directory: A directory where every process writes its spans when it exits. None doesn't write them.
+        '''
+        self.capacity = capacity
+        self.directory = directory
+        self.pid = None
+        # spans = deque([(phase, uid, order, tid, start, end), ...]), in nanoseconds since the epoch
+        self.spans = None
+        # starts = {(uid, tid): (order, start)}, names = {tid: thread name}
+        self.starts = {}
+        self.names = {}
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.update(pid=None, spans=None, starts={}, names={})
+        return state
+
+    def buffer(self) -> deque:
+        '''
+        Returns the ring buffer of the current process, which is empty in a process that has just been started.
+        '''
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.spans = deque(maxlen=self.capacity)
+            self.starts = {}
+            self.names = {}
+            if self.directory is not None:
+                Finalize(None, self.flush, exitpriority=10)
+        return self.spans
+
+    def acquired(self, uid: Union[str, int], order: int, since: int):
+        '''
+        :param uid: The uid just taken.
+        :param order: The order it was taken with.
+        :param since: When the worker started waiting for it, as returned by 'time.time_ns()'.
+        '''
+        now = time_ns()
+        tid = threading.get_ident()
+        spans = self.buffer()
+        spans.append(('wait', uid, order, tid, since, now))
+        self.starts[(uid, tid)] = (order, now)
+        if tid not in self.names:
+            self.names[tid] = threading.current_thread().name
+
+    def released(self, uid: Union[str, int]):
+        spans = self.buffer()
+        tid = threading.get_ident()
+        # A permit can be released by a worker other than the one that took it, whose hold time is unknown
+        start = self.starts.pop((uid, tid), None)
+        if start is not None:
+            spans.append(('hold', uid, start[0], tid, start[1], time_ns()))
+
+    def events(self) -> List[Dict[str, Any]]:
+        '''
+        Returns the spans of the current process as Chrome trace events.
+        '''
+        spans = list(self.buffer())
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': self.pid, 'args': {'name': current_process().name}}]
+        events += [{'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}}
+                   for tid, name in list(self.names.items())]
+        events += [{'name': f'{phase} {uid!r}', 'cat': phase, 'ph': 'X', 'ts': start / 1000,
+                    'dur': (end - start) / 1000, 'pid': self.pid, 'tid': tid,
+                    'args': {'uid': uid if isinstance(uid, int) else str(uid), 'order': order}}
+                   for phase, uid, order, tid, start, end in spans]
+        return events
+
+    def export(self, path: str = None) -> Dict[str, Any]:
+        '''
+        Exports the spans of the current process as a Chrome trace.
+        :param path: A file to write the trace to, as JSON. None doesn't write it.
+        :return: The trace.
+        '''
+        trace = {'traceEvents': self.events(), 'displayTimeUnit': 'ms'}
+        if path is not None:
+            with open(path, 'w') as f:
+                json.dump(trace, f)
+        return trace
+
+    def flush(self):
+        '''
+        Writes the spans of the current process to its own file in the directory of the profiler.
+        '''
+        self.export(os.path.join(self.directory, f'{os.getpid()}-{id(self)}.json'))
+
+    @staticmethod
+    def merge(directory: str, path: str = None) -> Dict[str, Any]:
+        '''
+        Joins the traces written by every process to a directory into a single one.
+        :param directory: The directory of the profiler.
+        :param path: A file to write the merged trace to, as JSON. None doesn't write it.
+        :return: The merged trace.
+        '''
+        events = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.json'):
+                with open(os.path.join(directory, name)) as f:
+                    events.extend(json.load(f)['traceEvents'])
+        trace = {'traceEvents': events, 'displayTimeUnit': 'ms'}
+        if path is not None:
+            with open(path, 'w') as f:
+                json.dump(trace, f)
+        return trace
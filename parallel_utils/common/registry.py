@@ -0,0 +1,274 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import os
+from multiprocessing.managers import BaseManager
+from threading import Condition, Lock
+from time import monotonic
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+from parallel_utils.common.uid_state import UidStates
+
+# The registry serves the state of process monitors. It lives out of parallel_utils.process because the managers that
+# serve it import this module when they are spawned, and importing that package starts the managers of its monitors.
+
+# What a call to lock a uid returns
+NOT_LOCKED, LOCKED, OWNER_DIED = 0, 1, 2
+
+# Number of seconds between two checks of whether the holders of a busy uid are still alive
+LEASE_CHECK = 0.5
+
+
+class OwnerDiedWarning(RuntimeWarning):
+    '''
+    Warns the process that has just locked a uid that a previous holder of the uid died while holding it, so the data
+    it protects may have been left inconsistent.
+    '''
+
+
+def alive(pid: int) -> bool:
+    '''
+    Whether a process is still running. Zombie processes, which have exited but haven't been reaped by their parent
+    yet, are not.
+    '''
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # The state comes right after the name of the command, which is between parentheses
+            return f.read().rpartition(')')[2].split()[0] != 'Z'
+    except OSError:
+        return True
+
+
+class MonitorState(UidStates):
+    '''
+    The state of a process Monitor. It lives in the manager process, where every client connection is served by its own
+    thread, so blocking on the state of a uid only blocks the connection of the calling thread.
+    Every permit is leased to the pid of the process that took it, and it is taken back if that process dies without
+    releasing it, which also moves the turn on to the next order of the uid.
+    '''
+
+    def __init__(self, signal: Callable[[], Any]):
+        '''
+        :param signal: Called whenever a permit is released or a place in the queue of a uid is given up, so that the
+            coroutines waiting for it try again.
+        '''
+        super().__init__()
+        self.signal = signal
+        self.refs = 0
+        # leases = {uid: [pid1, pid2, ...]} with the holders of every uid, orphaned = {uid1, uid2, ...} with the uids
+        # whose holder died since they were last locked, and checked = {uid: time} with their last liveness check
+        self.leases = {}
+        self.orphaned = set()
+        self.checked = {}
+
+    def lock(self, uid: Union[str, int], order: int, total: int, max_threads: int, blocking: bool = True,
+             pid: int = None, weight: int = 1, ticket: Tuple[int, str] = None) -> int:
+        '''
+        :param ticket: A (pid, id) tuple with the place a caller that doesn't block keeps in the queue of the uid
+            between tries. It is withdrawn by 'reap' if that process dies.
+        '''
+        state = self.get(uid, order, total, max_threads, blocking)
+        if state is None:
+            return NOT_LOCKED
+        if blocking:
+            # The caller keeps its place in the queue of the uid between liveness checks
+            ticket = object()
+            try:
+                while not state.acquire(order, timeout=LEASE_CHECK, weight=weight, ticket=ticket):
+                    self.reap(uid)
+                    if pid is not None and not alive(pid):
+                        state.withdraw(ticket)
+                        self.signal()
+                        return NOT_LOCKED
+            except BaseException:
+                state.withdraw(ticket)
+                self.signal()
+                raise
+        elif not state.acquire(order, False, weight=weight, ticket=ticket):
+            if monotonic() - self.checked.get(uid, 0) < LEASE_CHECK or not self.reap(uid):
+                return NOT_LOCKED
+            if not state.acquire(order, False, weight=weight, ticket=ticket):
+                return NOT_LOCKED
+        if state.queue:
+            # The next one in the queue may be a coroutine that can take its permits now
+            self.signal()
+        with self.locker:
+            # Every permit is leased on its own, so that a weighted lock is taken back like that many single ones
+            self.leases.setdefault(uid, []).extend([pid] * weight)
+            if uid not in self.orphaned:
+                return LOCKED
+            self.orphaned.discard(uid)
+            return OWNER_DIED
+
+    def unlock(self, uid: Union[str, int], pid: int = None, weight: int = 1):
+        with self.locker:
+            leases = self.leases.get(uid, [])
+            for _ in range(min(weight, len(leases))):
+                # A permit can be released by a process other than the one that took it
+                leases.remove(pid if pid in leases else leases[0])
+        self.states[uid].release(weight)
+        self.signal()
+
+    def reap(self, uid: Union[str, int]) -> bool:
+        '''
+        Takes back the permits of a uid held by processes that are not alive anymore, and withdraws their tickets.
+        :return: Whether any permit was taken back.
+        '''
+        self.checked[uid] = monotonic()
+        state = self.states[uid]
+        withdrawn = False
+        for ticket in list(state.queue or ()):
+            if isinstance(ticket, tuple) and not alive(ticket[0]):
+                state.withdraw(ticket)
+                withdrawn = True
+        with self.locker:
+            leases = self.leases.get(uid, [])
+            dead = [pid for pid in leases if pid is not None and not alive(pid)]
+            for pid in dead:
+                leases.remove(pid)
+            if dead:
+                self.orphaned.add(uid)
+        for _ in dead:
+            state.release()
+        if dead or withdrawn:
+            self.signal()
+        return bool(dead)
+
+
+class Registry:
+    '''
+    Holds the states of every process Monitor, so that each process reaches all of them through a single proxy, and
+    therefore through a single connection per thread. Every operation on a uid is a single round trip.
+    The registry of the first shard also starts the managers of the other shards, the first time they are needed, and
+    keeps the reference counts of the monitors. The states of the monitors are created on their first use.
+    '''
+
+    def __init__(self):
+        self.locker = Lock()
+        # monitors = {key1: state1, key2: state2, ...}
+        self.monitors = {}
+        # shards = {index: (manager, registry)} with the other shards, which only the first registry starts
+        self.shards = {}
+        self.starting = Lock()
+        # The number of times a permit was released or a place in a queue was given up, waited for by 'wait_released'
+        self.released = Condition(Lock())
+        self.releases = 0
+
+    def incref(self, key: str):
+        with self.locker:
+            self.monitors.setdefault(key, MonitorState(self.signal)).refs += 1
+
+    def decref(self, key: str):
+        with self.locker:
+            state = self.monitors[key]
+            state.refs -= 1
+            if state.refs > 0:
+                return
+            del self.monitors[key]
+        [registry.forget(key) for _, registry in list(self.shards.values())]
+
+    def forget(self, key: str):
+        with self.locker:
+            self.monitors.pop(key, None)
+
+    def shard(self, index: int) -> 'Registry':
+        '''
+        Returns the registry of another shard, starting its manager the first time. Every process asks the first
+        registry for it, so that all of them get the same one, even those forked before it was started.
+        '''
+        with self.starting:
+            if index not in self.shards:
+                manager = MonitorManager()
+                manager.start()
+                self.shards[index] = (manager, manager.Registry())
+            return self.shards[index][1]
+
+    def state(self, key: str) -> MonitorState:
+        state = self.monitors.get(key)
+        if state is None:
+            with self.locker:
+                state = self.monitors.setdefault(key, MonitorState(self.signal))
+        return state
+
+    def lock(self, key: str, uid: Union[str, int], order: int, total: int, max_threads: int, blocking: bool = True,
+             pid: int = None, weight: int = 1) -> int:
+        return self.state(key).lock(uid, order, total, max_threads, blocking, pid, weight)
+
+    def unlock(self, key: str, uid: Union[str, int], pid: int = None, weight: int = 1):
+        self.state(key).unlock(uid, pid, weight)
+
+    def lock_many(self, key: str, uids: List[Union[str, int]], max_threads: int, pid: int = None) -> List[int]:
+        '''
+        :return: What locking every uid returned.
+        '''
+        state, results = self.state(key), []
+        try:
+            for uid in uids:
+                results.append(state.lock(uid, 1, 1, max_threads, pid=pid))
+        except BaseException:
+            [state.unlock(uid, pid) for uid in reversed(uids[:len(results)])]
+            raise
+        return results
+
+    def unlock_many(self, key: str, uids: List[Union[str, int]], pid: int = None):
+        state = self.state(key)
+        [state.unlock(uid, pid) for uid in uids]
+
+    def total(self, key: str, uid: Union[str, int]) -> Optional[int]:
+        return self.state(key).total(uid)
+
+    def try_lock_all(self, requests: List[Tuple[str, Union[str, int], int, int, Tuple[int, str]]],
+                     pid: int = None) -> List[int]:
+        '''
+        Tries to lock, without blocking, a batch of uids of any monitor.
+        :param requests: A list of (key, uid, max_threads, weight, ticket) tuples.
+        :param pid: The process the uids are locked for.
+        :return: What locking every uid returned, or the ValueError it raised, so that it only fails its own request.
+        '''
+        results = []
+        for key, uid, max_threads, weight, ticket in requests:
+            try:
+                results.append(self.state(key).lock(uid, 1, 1, max_threads, False, pid, weight, ticket))
+            except ValueError as e:
+                results.append(e)
+        return results
+
+    def withdraw(self, key: str, uid: Union[str, int], ticket: Tuple[int, str]):
+        '''
+        Takes the ticket of a caller that stopped trying out of the queue of a uid.
+        '''
+        state = self.state(key).states.get(uid)
+        if state is not None:
+            state.withdraw(ticket)
+            self.signal()
+
+    def signal(self):
+        with self.released:
+            self.releases += 1
+            self.released.notify_all()
+
+    def wait_released(self, since: Optional[int], timeout: float) -> int:
+        '''
+        Blocks until a permit of any uid is released, or a place in a queue is given up, unless it already happened
+        since a previous call returned, so that the caller doesn't miss the ones in between.
+        :param since: What the previous call returned, or None for the first call, which returns right away.
+        :param timeout: Maximum number of seconds to wait.
+        :return: The number of times it happened so far, to be passed to the next call.
+        '''
+        with self.released:
+            self.released.wait_for(lambda: self.releases != since, timeout)
+            return self.releases
+
+
+class MonitorManager(BaseManager):
+    pass
+
+
+MonitorManager.register('Registry', Registry)
@@ -0,0 +1,57 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+from threading import get_ident
+from time import perf_counter, sleep
+from typing import Any, Callable, Union
+
+
+class AdaptiveSpin:
+    '''
+    Tries to take a semaphore a bounded number of times, yielding the CPU between tries, before blocking on it.
+    The number of tries of every uid is tuned from the time its permits have recently been held: it doubles while
+    the average hold time is short enough to make spinning cheaper than parking the thread, and halves otherwise.
+    '''
+
+    def __init__(self, max_spins: int = 100, max_hold: float = 0.0001, try_cost: float = 0):
+        '''
+        :param max_spins: Maximum number of tries before blocking.
+        :param max_hold: Average hold time, in seconds, above which spinning is not worth it.
+        :param try_cost: Number of seconds a single try takes, if it isn't negligible. The tries are capped so that
+        they never take longer than max_hold altogether, which disables spinning if a single try takes longer.
+        '''
+        self.max_spins = max_spins if try_cost <= 0 else min(max_spins, int(max_hold / try_cost))
+        self.max_hold = max_hold
+        # budgets = {uid: spins}, hold_times = {uid: average hold time}, starts = {(uid, thread): acquisition time}
+        self.budgets = {}
+        self.hold_times = {}
+        self.starts = {}
+
+    def acquire(self, uid: Union[str, int], acquire: Callable[[bool], Any]) -> Any:
+        '''
+        :param uid: The uid to take.
+        :param acquire: A function that takes the uid, blocking or not, like the 'acquire' method of a semaphore.
+        :return: What the successful call to 'acquire' returned.
+        '''
+        for _ in range(self.budgets.get(uid, self.max_spins)):
+            result = acquire(False)
+            if result:
+                break
+            sleep(0)
+        else:
+            result = acquire(True)
+        self.starts[(uid, get_ident())] = perf_counter()
+        return result
+
+    def released(self, uid: Union[str, int]):
+        start = self.starts.pop((uid, get_ident()), None)
+        if start is None:
+            return
+        hold = perf_counter() - start
+        average = self.hold_times[uid] = self.hold_times.get(uid, hold) * 0.75 + hold * 0.25
+        budget = self.budgets.get(uid, self.max_spins)
+        if average <= self.max_hold:
+            self.budgets[uid] = min(self.max_spins, max(1, budget * 2))
+        else:
+            self.budgets[uid] = budget // 2
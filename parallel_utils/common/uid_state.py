@@ -0,0 +1,191 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+from collections import deque
+from threading import Condition, Lock
+from typing import Optional, Union
+from zlib import crc32
+
+
+def shard_of(uid: Union[str, int], shards: int) -> int:
+    '''
+    Returns the shard a uid belongs to. Unlike the built-in 'hash', it is the same in every process.
+    :param uid: The uid.
+    :param shards: The number of shards.
+    '''
+    if isinstance(uid, int):
+        return uid % shards
+    return crc32(uid.encode() if isinstance(uid, str) else repr(uid).encode()) % shards
+
+
+class UidState:
+    '''
+    The state of a uid: a single condition variable, the number of permits still free and the order whose turn it is.
+    Its size doesn't depend on the total number of pieces of code synchronized with the uid.
+    A uid that only one thread can enter at a time, and which has no order, is just a lock instead.
+    Threads can take several permits at once. Those that have to wait are served in arrival order, so that a thread
+    waiting for many permits isn't starved by the ones that keep taking a few.
+    '''
+
+    __slots__ = ('condition', 'total', 'capacity', 'free', 'turn', 'lock', 'queue')
+
+    def __init__(self, total: int, max_threads: int):
+        self.lock = Lock() if total == 1 and max_threads == 1 else None
+        self.condition = None if self.lock is not None else Condition(Lock())
+        self.total = total
+        # The number of permits the uid was set up with
+        self.capacity = max_threads
+        self.free = max_threads
+        self.turn = 1
+        # The threads waiting for permits, in arrival order. Only uids without order that aren't just a lock queue them,
+        # and only once one of them has to wait.
+        self.queue = None
+
+    def acquire(self, order: int, blocking: bool = True, timeout: float = None, weight: int = 1,
+                ticket: object = None) -> bool:
+        '''
+        :param ticket: An object that identifies the caller in the queue. If given, the caller keeps its place in the
+        queue when the timeout expires, or when it couldn't take the permits without blocking, so that it can try again
+        later without losing it, and it must be withdrawn with 'withdraw' if the caller gives up.
+        :raises ValueError: If the weight is more than the number of permits of the uid, so it could never be taken.
+        '''
+        if weight > self.capacity:
+            raise ValueError(f'a weight of {weight} can never be taken from a uid with {self.capacity} permits')
+        if self.lock is not None:
+            return self.lock.acquire(blocking, -1 if timeout is None or not blocking else timeout)
+        with self.condition:
+            if self.turn == order and self.free >= weight and (not self.queue or self.queue[0] == ticket):
+                self.free -= weight
+                if self.queue:
+                    self.queue.popleft()
+                    # The next thread in the queue may be able to take its permits too
+                    self.condition.notify_all()
+                return True
+            if not blocking:
+                if ticket is not None and self.total == 1:
+                    self.enqueue(ticket)
+                return False
+            if self.total > 1:
+                if not self.condition.wait_for(lambda: self.turn == order and self.free >= weight, timeout):
+                    return False
+                self.free -= weight
+                return True
+            kept = ticket is not None
+            ticket = ticket if kept else object()
+            self.enqueue(ticket)
+            acquired = False
+            try:
+                acquired = self.condition.wait_for(lambda: self.queue[0] == ticket and self.free >= weight, timeout)
+                if acquired:
+                    self.free -= weight
+                return acquired
+            finally:
+                if acquired or not kept:
+                    self.queue.remove(ticket)
+                    # The next thread in the queue may be able to take its permits too
+                    self.condition.notify_all()
+
+    def enqueue(self, ticket: object):
+        if self.queue is None:
+            self.queue = deque()
+        if ticket not in self.queue:
+            self.queue.append(ticket)
+
+    def withdraw(self, ticket: object):
+        '''
+        Takes a ticket kept by 'acquire' out of the queue.
+        '''
+        if self.condition is None:
+            return
+        with self.condition:
+            if self.queue and ticket in self.queue:
+                self.queue.remove(ticket)
+                self.condition.notify_all()
+
+    def release(self, weight: int = 1):
+        if self.lock is not None:
+            self.lock.release()
+            return
+        with self.condition:
+            self.free += weight
+            if self.total > 1:
+                self.turn = self.turn % self.total + 1
+            # Uids without order only have waiting threads in their queue
+            if self.total > 1 or self.queue:
+                self.condition.notify_all()
+
+
+class UidStates:
+    '''
+    The states of every uid of a Monitor.
+    '''
+
+    def __init__(self):
+        self.locker = Lock()
+        # Threads waiting for a uid to be set up by a call that provides its total wait on this condition
+        self.setup = Condition(self.locker)
+        # states = {'uid1': state1, 'uid2': state2, ...}
+        self.states = {}
+
+    def get(self, uid: Union[str, int], order: int, total: int, max_threads: int,
+            blocking: bool = True) -> Optional[UidState]:
+        '''
+        Returns the state of a uid, setting it up if 'total' is provided, or waiting until another call sets it up.
+        :return: The state, or None if it isn't set up yet and 'blocking' is False.
+        '''
+        state = self.states.get(uid)
+        if state is not None:
+            return state
+        with self.setup:
+            while True:
+                state = self.states.get(uid)
+                if state is not None:
+                    return state
+                if total is not None:
+                    assert order <= total
+                    state = self.states[uid] = UidState(total, max_threads)
+                    self.setup.notify_all()
+                    return state
+                if not blocking:
+                    return None
+                self.setup.wait()
+
+    def lock(self, uid: Union[str, int], order: int, total: int, max_threads: int, blocking: bool = True,
+             weight: int = 1) -> bool:
+        state = self.get(uid, order, total, max_threads, blocking)
+        return state is not None and state.acquire(order, blocking, weight=weight)
+
+    def unlock(self, uid: Union[str, int], weight: int = 1):
+        self.states[uid].release(weight)
+
+    def total(self, uid: Union[str, int]) -> Optional[int]:
+        state = self.states.get(uid)
+        return None if state is None else state.total
+
+
+class ShardedUidStates:
+    '''
+    The states of every uid of a Monitor, spread across several independent UidStates, so that uids of different shards
+    never contend for the same lock.
+    '''
+
+    def __init__(self, shards: int):
+        self.shards = tuple(UidStates() for _ in range(shards))
+
+    def shard(self, uid: Union[str, int]) -> UidStates:
+        return self.shards[shard_of(uid, len(self.shards))]
+
+    def get(self, uid: Union[str, int], order: int, total: int, max_threads: int,
+            blocking: bool = True) -> Optional[UidState]:
+        return self.shard(uid).get(uid, order, total, max_threads, blocking)
+
+    def lock(self, uid: Union[str, int], order: int, total: int, max_threads: int, blocking: bool = True,
+             weight: int = 1) -> bool:
+        return self.shard(uid).lock(uid, order, total, max_threads, blocking, weight)
+
+    def unlock(self, uid: Union[str, int], weight: int = 1):
+        self.shard(uid).unlock(uid, weight)
+
+    def total(self, uid: Union[str, int]) -> Optional[int]:
+        return self.shard(uid).total(uid)
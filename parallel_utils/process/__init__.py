@@ -3,5 +3,12 @@
 
 
 from parallel_utils.process.monitor import Monitor, StaticMonitor
-from parallel_utils.process.decorators import synchronized, synchronized_priority
-from parallel_utils.process.utils import create_process
+from parallel_utils.common.registry import LOCKED, OWNER_DIED, OwnerDiedWarning
+from parallel_utils.process.decorators import single_flight, synchronized, synchronized_priority
+from parallel_utils.process.utils import create_process, create_process_async
+from parallel_utils.process.stream import ProcessStream, create_process_stream
+from parallel_utils.process.pool import ProcessPool
+from parallel_utils.process.channel import Channel, ChannelClosed
+from parallel_utils.process.task_group import TaskGroup
+from parallel_utils.common import TaskGroupError
+from parallel_utils.process.arrays import map_array
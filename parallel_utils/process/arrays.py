@@ -0,0 +1,118 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import mmap
+import os
+from collections import namedtuple
+from concurrent.futures import wait
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Optional, Tuple
+
+from parallel_utils.process.utils import create_process
+
+try:
+    import numpy
+except ImportError:
+    # NumPy is only needed by 'map_array', so it isn't a requirement of the library
+    numpy = None
+
+# Where the data of an array lives: the name of a shared memory block, or the path of a memory-mapped file
+Block = namedtuple('Block', ('name', 'shape', 'dtype', 'offset', 'memmap'))
+
+
+def is_mapped_file(array: Any) -> bool:
+    '''
+    Whether an array is a whole memory-mapped file, and not a view of one, which workers can open by themselves.
+    '''
+    return isinstance(array, numpy.memmap) and isinstance(array.base, mmap.mmap) and array.flags.c_contiguous
+
+
+def share(array: Any, copy: bool = True) -> Tuple[Block, Optional[SharedMemory]]:
+    '''
+    Returns where workers can find the data of an array, placing it in shared memory unless it's a memory-mapped file.
+    :param array: The array.
+    :param copy: Whether the data of the array must be copied to the shared memory, or just its shape.
+    :return: The block, and the shared memory it lives in, if any, which must be unlinked when it isn't needed anymore.
+    '''
+    if is_mapped_file(array):
+        array.flush()
+        return Block(array.filename, array.shape, array.dtype, array.offset, True), None
+    memory = SharedMemory(create=True, size=max(array.nbytes, 1))
+    if copy:
+        view = numpy.ndarray(array.shape, array.dtype, buffer=memory.buf)
+        view[...] = array
+        del view
+    return Block(memory.name, array.shape, array.dtype, 0, False), memory
+
+
+def attach(block: Block, writable: bool) -> Tuple[Any, Optional[SharedMemory]]:
+    '''
+    Returns a zero-copy view of the data of a block, and the shared memory it lives in, if any.
+    '''
+    if block.memmap:
+        return numpy.memmap(block.name, block.dtype, 'r+' if writable else 'r', block.offset, block.shape), None
+    memory = SharedMemory(name=block.name)
+    array = numpy.ndarray(block.shape, block.dtype, buffer=memory.buf)
+    array.flags.writeable = writable
+    return array, memory
+
+
+def _map_chunk(func: Callable, source: Block, target: Block, start: int, stop: int):
+    source_array, source_memory = attach(source, False)
+    target_array, target_memory = attach(target, True)
+    try:
+        target_array[start:stop] = func(source_array[start:stop])
+        if target.memmap:
+            target_array.flush()
+    finally:
+        del source_array, target_array
+        for memory in (source_memory, target_memory):
+            if memory is not None:
+                try:
+                    memory.close()
+                except BufferError:
+                    # An exception raised by func still references a view, which is released when the process exits
+                    pass
+
+
+def map_array(func: Callable, array: Any, out: Any = None, dtype: Any = None, chunks: int = None) -> Any:
+    '''
+    Calls a function on consecutive chunks of a NumPy array along its first axis, each chunk in its own process.
+    Workers get zero-copy views of their chunks, from shared memory or from the memory-mapped file of the array, and
+    write the results straight into the same rows of the output array, so nothing is pickled but the function.
+    :param func: A picklable function that takes a chunk of the array and returns an array with as many rows.
+    :param array: The input array, which can be a 'numpy.memmap' of a file larger than RAM.
+    :param out: The output array, with as many rows as the input one. If it's a 'numpy.memmap', workers write into
+    its file directly. Defaults to a new array with the shape of the input one.
+    :param dtype: The data type of the output array, if it isn't given. Defaults to the one of the input array.
+    :param chunks: The number of chunks, and therefore of processes. Defaults to the number of CPUs.
+    :return: The output array.
+    '''
+    if numpy is None:
+        raise ImportError("'map_array' requires NumPy, which can be installed with 'pip install parallel-utils[numpy]'")
+    if out is None:
+        out = numpy.empty(array.shape, array.dtype if dtype is None else dtype)
+    if len(out) != len(array):
+        raise ValueError(f'the output array has {len(out)} rows, but the input one has {len(array)}')
+    chunks = min(chunks or os.cpu_count() or 1, len(array))
+    if chunks == 0:
+        return out
+    source, source_memory = share(array)
+    target, target_memory = share(out, copy=False)
+    try:
+        bounds = [len(array) * i // chunks for i in range(chunks + 1)]
+        processes = [create_process(_map_chunk, func, source, target, start, stop)
+                     for start, stop in zip(bounds, bounds[1:])]
+        wait(processes)
+        [p.result() for p in processes]
+        if target_memory is not None:
+            results = numpy.ndarray(target.shape, target.dtype, buffer=target_memory.buf)
+            out[...] = results
+            del results
+    finally:
+        for memory in (source_memory, target_memory):
+            if memory is not None:
+                memory.close()
+                memory.unlink()
+    return out
@@ -0,0 +1,132 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import pickle
+from multiprocessing import Condition, Lock, RawArray
+from struct import Struct
+from time import monotonic
+from typing import Any, Iterable, List
+
+from parallel_utils.common import AbstractChannel, ChannelClosed
+
+HEADER = Struct('<I')
+HEAD, TAIL, USED, COUNT, CLOSED = range(5)
+
+
+class Channel(AbstractChannel):
+    '''
+    A bounded channel to pass items between processes. Items are pickled into a ring buffer in shared memory, so unlike
+    Manager proxies, putting or getting an item doesn't need a round trip to a server process.
+    Like 'multiprocessing.Queue', it must be shared with other processes through inheritance, for example by creating
+    it in a module-level variable before launching them.
+    '''
+
+    def __init__(self, maxsize: int = 1, capacity: int = 1 << 20):
+        '''
+        :param maxsize: Maximum number of items the channel can hold.
+        :param capacity: Size in bytes of the shared ring buffer. Every pickled item must fit into it.
+        '''
+        assert maxsize > 0
+        self.maxsize = maxsize
+        self.capacity = capacity
+        self.buffer = RawArray('B', capacity)
+        # state = [head, tail, used bytes, number of items, closed]
+        self.state = RawArray('q', 5)
+        self.lock = Lock()
+        self.not_empty = Condition(self.lock)
+        self.not_full = Condition(self.lock)
+        self.view = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['view'] = None
+        return state
+
+    def memory(self) -> memoryview:
+        if self.view is None:
+            self.view = memoryview(self.buffer).cast('B')
+        return self.view
+
+    def write(self, data: bytes):
+        view, start = self.memory(), self.state[TAIL]
+        end = start + len(data)
+        if end <= self.capacity:
+            view[start:end] = data
+        else:
+            first = self.capacity - start
+            view[start:] = data[:first]
+            view[:end - self.capacity] = data[first:]
+        self.state[TAIL] = end % self.capacity
+        self.state[USED] += len(data)
+
+    def read(self, size: int) -> bytes:
+        view, start = self.memory(), self.state[HEAD]
+        end = start + size
+        if end <= self.capacity:
+            data = bytes(view[start:end])
+        else:
+            data = bytes(view[start:]) + bytes(view[:end - self.capacity])
+        self.state[HEAD] = end % self.capacity
+        self.state[USED] -= size
+        return data
+
+    def put_many(self, items: Iterable[Any], timeout: float = None) -> int:
+        records = []
+        for item in items:
+            payload = pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+            record = HEADER.pack(len(payload)) + payload
+            if len(record) > self.capacity:
+                raise ValueError(f'Item of {len(record)} bytes does not fit into a channel of {self.capacity} bytes')
+            records.append(record)
+        deadline = None if timeout is None else monotonic() + timeout
+        put = 0
+        with self.lock:
+            state = self.state
+            while put < len(records):
+                if state[CLOSED]:
+                    if put == 0:
+                        raise ChannelClosed
+                    break
+                if state[COUNT] == self.maxsize or len(records[put]) > self.capacity - state[USED]:
+                    remaining = None if deadline is None else deadline - monotonic()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self.not_full.wait(remaining)
+                    continue
+                while put < len(records) and state[COUNT] < self.maxsize and \
+                        len(records[put]) <= self.capacity - state[USED]:
+                    self.write(records[put])
+                    state[COUNT] += 1
+                    put += 1
+                self.not_empty.notify_all()
+        return put
+
+    def get_many(self, max_items: int, timeout: float = None) -> List[Any]:
+        assert max_items > 0
+        deadline = None if timeout is None else monotonic() + timeout
+        with self.lock:
+            state = self.state
+            while state[COUNT] == 0:
+                if state[CLOSED]:
+                    raise ChannelClosed
+                remaining = None if deadline is None else deadline - monotonic()
+                if remaining is not None and remaining <= 0:
+                    return []
+                self.not_empty.wait(remaining)
+            payloads = []
+            for _ in range(min(max_items, state[COUNT])):
+                size, = HEADER.unpack(self.read(HEADER.size))
+                payloads.append(self.read(size))
+                state[COUNT] -= 1
+            self.not_full.notify_all()
+        return [pickle.loads(payload) for payload in payloads]
+
+    def close(self):
+        with self.lock:
+            self.state[CLOSED] = 1
+            self.not_empty.notify_all()
+            self.not_full.notify_all()
+
+    def __len__(self):
+        return self.state[COUNT]
@@ -2,9 +2,12 @@
 # encoding:utf-8
 
 
+import os
 from functools import wraps
+from itertools import count
 from multiprocessing import Manager
-from typing import Union
+from time import time
+from typing import Any, Callable, Hashable, Union
 
 from parallel_utils.process import Monitor
 
@@ -28,6 +31,95 @@ def synchronized(max_threads: int = 1):
     return locked
 
 
+def default_key(*args: Any, **kwargs: Any) -> Hashable:
+    return args, tuple(sorted(kwargs.items()))
+
+
+def single_flight(key: Callable[..., Hashable] = None, ttl: float = None, maxsize: int = 128):
+    '''
+    This decorator will collapse concurrent calls to this function with the same key, even from different processes,
+    into a single execution, whose result or exception is shared by all of them.
+    :param key: A function called with the same arguments that returns the key of the call. By default, the key is
+    built from the arguments themselves, so they must be hashable and picklable.
+    :param ttl: Number of seconds the result of a call is cached after it finishes. None by default, so results are
+    only shared with the calls made while it was running.
+    :param maxsize: Maximum number of cached results. The least recently used ones are evicted first.
+    '''
+    key = key or default_key
+    m = Manager()
+    condition = m.Condition(m.Lock())
+    # flights = {key: [generation, number of waiters]} for every running call
+    flights = m.dict()
+    # outcomes = {key: (generation, succeeded, value, number of waiters yet to read it)}
+    outcomes = m.dict()
+    # cache = {key: (expiration, value)}, in least recently used order
+    cache = m.dict()
+    generations = count()
+
+    def locked(func):
+        @wraps(func)
+        def locked_func(*args, **kwargs):
+            k = key(*args, **kwargs)
+            with condition:
+                cached = cache.get(k)
+                if cached is not None and cached[0] > time():
+                    cache.pop(k)
+                    cache[k] = cached
+                    return cached[1]
+                flight = flights.get(k)
+                if flight is not None:
+                    flights[k] = [flight[0], flight[1] + 1]
+                    while flights.get(k, (None,))[0] == flight[0]:
+                        condition.wait()
+                    generation, succeeded, value, waiters = outcomes[k]
+                    if waiters > 1:
+                        outcomes[k] = (generation, succeeded, value, waiters - 1)
+                    else:
+                        del outcomes[k]
+                    if succeeded:
+                        return value
+                    raise value
+                generation = (os.getpid(), next(generations))
+                flights[k] = [generation, 0]
+            succeeded = False
+            try:
+                value = func(*args, **kwargs)
+                succeeded = True
+                return value
+            except BaseException as e:
+                value = e
+                raise
+            finally:
+                with condition:
+                    try:
+                        waiters = flights.pop(k)[1]
+                        shared = True
+                        if waiters > 0:
+                            try:
+                                outcomes[k] = (generation, succeeded, value, waiters)
+                            except Exception as e:
+                                # The value couldn't be pickled, so the waiters get an error instead
+                                shared = False
+                                error = RuntimeError(f'the outcome of the call could not be shared: {value!r} ({e!r})')
+                                outcomes[k] = (generation, False, error, waiters)
+                        if succeeded and shared and ttl is not None:
+                            cache.pop(k, None)
+                            try:
+                                cache[k] = (time() + ttl, value)
+                            except Exception:
+                                # Results that can't be pickled aren't cached
+                                pass
+                            while len(cache) > maxsize:
+                                cache.pop(next(iter(cache.keys())))
+                    finally:
+                        # The waiters are woken up whatever happens, so that none of them waits forever
+                        condition.notify_all()
+
+        return locked_func
+
+    return locked
+
+
 def synchronized_priority(uid: Union[str, int], order: int = 1, total: int = None):
     m = Monitor()
 
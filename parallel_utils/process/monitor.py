@@ -2,18 +2,238 @@
 # encoding:utf-8
 
 
-from typing import Union
+import asyncio
+import logging
+import os
+import pickle
+import warnings
+from collections import OrderedDict, namedtuple
+from functools import partial
+from itertools import groupby
+from multiprocessing.util import Finalize
+from threading import Event, Lock, Thread
+from time import perf_counter, time_ns
+from typing import Any, Callable, Iterable, Union
+from uuid import uuid4
+from weakref import WeakValueDictionary
 
 from private_attrs import PrivateAttrs
 
-from parallel_utils.common import AbstractMonitor
+from parallel_utils.common import AbstractMonitor, AdaptiveSpin, DeadlockDetector, Profiler, shard_of
+from parallel_utils.common.registry import LEASE_CHECK, OWNER_DIED, MonitorManager, OwnerDiedWarning, Registry
+
+logger = logging.getLogger('parallel_utils')
+
+# Number of monitors unpickled in a process that are kept alive after their last use, so that a worker that keeps
+# receiving the same ones only attaches them once
+KEPT_ATTACHED = 16
+
+
+class Client(namedtuple('Client', ('pid', 'registries', 'key', 'detector', 'spinner', 'profiler'))):
+    __slots__ = ()
+
+    def registry(self, uid: Union[str, int]):
+        '''
+        Returns the registry that holds the state of a uid, asking the first registry for it the first time.
+        '''
+        registries = self.registries
+        if len(registries) == 1:
+            return registries[0]
+        index = shard_of(uid, len(registries))
+        registry = registries[index]
+        if registry is None:
+            registry = registries[index] = registries[0].shard(index)
+        return registry
+
+
+Waiter = namedtuple('Waiter', ('registry', 'key', 'uid', 'max_threads', 'weight', 'ticket', 'loop', 'future'))
 
 
 def Monitor():
     p = PrivateAttrs(proxy=True)
-    locker = p.manager.Semaphore(1)
 
-    def lock_priority_code(self, uid: Union[str, int], order: int, total: int, max_threads: int):
+    # Every shard of the monitors is served by the registry of its own manager, so that uids of different shards are
+    # never served by the same process. The manager of the first shard is started with the factory, so that forked
+    # children reach the same one, and it starts the other ones when a uid of their shard is first used.
+    manager = MonitorManager()
+    manager.start()
+    root = manager.Registry()
+
+    # The state of every monitor lives in the registries of the managers. What a process needs to reach it is cached per
+    # process, so that calls don't need to ask the manager for it every time, like this: clients = {id(monitor): client}
+    clients = {}
+
+    # Monitors are pickled as a small handle made of a token and their pickled state, which is only computed once.
+    # Unpickling a handle in a process where its token is already alive returns the same monitor, without rebuilding
+    # its Manager proxies again, so handles = {id(monitor): (token, state)} and monitors = {token: monitor}, which only
+    # references them weakly. The last attached ones are also kept in attached = {token: monitor}, from the least to
+    # the most recently used, and the rest are deleted, which releases their state, once nothing else uses them.
+    handles = {}
+    monitors = WeakValueDictionary()
+    attached = OrderedDict()
+
+    # Coroutines waiting in 'acquire_async' are served by a single notifier thread per process, which tries to lock all
+    # of their uids in a single round trip. It is woken up by a watcher thread per registry they wait on, which blocks
+    # in the registry until a permit is released in any process, like this: watchers = {registry: thread}
+    waiters = []
+    waiters_lock = Lock()
+    wakeup = Event()
+    notifier = [None]
+    watchers = {}
+
+    def start_notifier():
+        if notifier[0] != os.getpid():
+            notifier[0] = os.getpid()
+            # The watchers of the parent process weren't forked along with it
+            watchers.clear()
+            Thread(target=notify, name='AsyncNotifier', daemon=True).start()
+
+    def notify():
+        try:
+            while True:
+                # It also tries every LEASE_CHECK seconds, which lets the registries take back the permits of the
+                # processes that died, which is never signaled
+                wakeup.wait(LEASE_CHECK)
+                wakeup.clear()
+                try:
+                    try_waiters()
+                except Exception:
+                    logger.exception('Failed to lock the uids of the coroutines waiting in acquire_async')
+        finally:
+            # The next coroutine that waits starts another notifier
+            notifier[0] = None
+
+    def watch(registry: Registry):
+        '''
+        Wakes the notifier up whenever a registry signals a release, while any coroutine waits on it.
+        '''
+        since = None
+        try:
+            while True:
+                current = registry.wait_released(since, LEASE_CHECK)
+                if current != since:
+                    since = current
+                    wakeup.set()
+                with waiters_lock:
+                    if not any(w.registry is registry for w in waiters):
+                        del watchers[registry]
+                        return
+        except Exception:
+            logger.exception('Failed to wait for the uids of the coroutines waiting in acquire_async to be released')
+            with waiters_lock:
+                watchers.pop(registry, None)
+
+    def try_waiters():
+        '''
+        Tries to lock the uid of every waiting coroutine, with a single round trip per registry.
+        '''
+        with waiters_lock:
+            # The coroutines of a closed loop can't be waiting anymore
+            gone = [w for w in waiters if w.future.done() or w.loop.is_closed()]
+            waiters[:] = [w for w in waiters if w not in gone]
+            pending = list(waiters)
+            for registry in {w.registry for w in pending} - watchers.keys():
+                watchers[registry] = Thread(target=watch, args=(registry,), name='AsyncWatcher', daemon=True)
+                watchers[registry].start()
+        # Their places in the queues of their uids are given up, so that those behind them don't wait for them
+        [w.registry.withdraw(w.key, w.uid, w.ticket) for w in gone]
+        locked, failed = [], []
+        for registry in {w.registry for w in pending}:
+            batch = [w for w in pending if w.registry is registry]
+            try:
+                requests = [(w.key, w.uid, w.max_threads, w.weight, w.ticket) for w in batch]
+                results = registry.try_lock_all(requests, os.getpid())
+            except Exception as e:
+                # The coroutines get the error, instead of waiting forever for a registry that can't be reached
+                logger.exception('Failed to lock the uids of the coroutines waiting in acquire_async')
+                with waiters_lock:
+                    waiters[:] = [w for w in waiters if w not in batch]
+                [schedule(w, fail, w, e) for w in batch]
+                continue
+            for w, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    # Only the coroutine whose request can never be served gets the error
+                    failed.append((w, result))
+                elif result:
+                    locked.append((w, result))
+        with waiters_lock:
+            for w, _ in locked + failed:
+                waiters.remove(w)
+        [schedule(w, fail, w, e) for w, e in failed]
+        for w, result in locked:
+            if not schedule(w, deliver, w, result):
+                w.registry.unlock(w.key, w.uid, os.getpid(), w.weight)
+
+    def schedule(waiter: Waiter, callback: Callable, *args: Any) -> bool:
+        '''
+        Calls a function in the loop of a waiter.
+        :return: False if the loop was already closed.
+        '''
+        try:
+            waiter.loop.call_soon_threadsafe(callback, *args)
+            return True
+        except RuntimeError:
+            return False
+
+    def fail(waiter: Waiter, error: Exception):
+        if not waiter.future.done():
+            waiter.future.set_exception(error)
+
+    def deliver(waiter: Waiter, result: int):
+        if waiter.future.done():
+            # The coroutine was cancelled meanwhile, so the uid it was given must be handed back
+            waiter.registry.unlock(waiter.key, waiter.uid, os.getpid(), waiter.weight)
+            wakeup.set()
+        else:
+            waiter.future.set_result(result)
+
+    def check_owner(uid: Union[str, int], result: int):
+        if result == OWNER_DIED:
+            warnings.warn(f'a process died while holding uid {uid!r}, so its permit was taken back', OwnerDiedWarning,
+                          stacklevel=4)
+
+    def attach_client(self, registries: list, key: str) -> Client:
+        '''
+        Creates the client of a monitor in the current process, which keeps the monitor state alive in the registries
+        until the monitor is deleted or the process exits.
+        :param registries: The registry of every shard, or None for those this process hasn't reached yet.
+        '''
+        registries[0].incref(key)
+        Finalize(self, registries[0].decref, args=(key,), exitpriority=20)
+        return refresh_client(self, Client(os.getpid(), registries, key, None, None, None))
+
+    def round_trip(client: Client) -> float:
+        '''
+        Measures how long a call to the registry of a monitor takes, which is what every spin costs.
+        '''
+        costs = []
+        for _ in range(3):
+            start = perf_counter()
+            client.registries[0].total(client.key, None)
+            costs.append(perf_counter() - start)
+        return min(costs)
+
+    def refresh_client(self, client: Client) -> Client:
+        spinner = p.spinner
+        # Spin statistics are local to every process, so only the settings are shared
+        spinner = None if spinner is None else AdaptiveSpin(*spinner, try_cost=round_trip(client))
+        # Spans are recorded by every process on its own too, and they are kept while the settings don't change
+        profiler = p.profiler
+        if profiler is not None:
+            current = client.profiler
+            kept = current is not None and (current.capacity, current.directory) == profiler
+            profiler = current if kept else Profiler(*profiler)
+        client = clients[id(self)] = client._replace(detector=p.detector, spinner=spinner, profiler=profiler)
+        return client
+
+    def get_client(self) -> Client:
+        client = clients[id(self)]
+        if client.pid != os.getpid():
+            # The monitor was inherited from the parent process
+            client = attach_client(self, client.registries, client.key)
+        return client
+
+    def lock_priority_code(self, uid: Union[str, int], order: int, total: int, max_threads: int, weight: int = 1):
         '''
         A private function that handles every use case. If total > 1, max_processes should be 1.
         :param self: A Monitor intance.
@@ -21,44 +241,59 @@ def Monitor():
         :param order: The priority of the code locked with this function's uid.
         :param total: The total number of pieces of code implied with this function's uid.
         :param max_threads: Maximum number of processes that can access the code simultaneously.
+        :param weight: Number of permits to take at once.
+        :return: LOCKED, or OWNER_DIED if a previous holder of the uid died while holding it.
         '''
         assert order > 0
-        assert max_threads > 0
-        semaphores = p.semaphores
-        while True:
-            locker.acquire()
-            s = semaphores.get(uid)
-            if s is not None:
-                locker.release()
-                break
-            if total is None:
-                setup_locker = p.setup_priority_lockers.get(uid)
-                if setup_locker is None:
-                    setup_locker = p.manager.Semaphore(0)
-                    p.setup_priority_lockers[uid] = setup_locker
-                locker.release()
-                setup_locker.acquire()
-            else:
-                assert order <= total
-                s = [p.manager.Semaphore(max_threads)]
-                s.extend([p.manager.Semaphore(0) for _ in range(total - 1)])
-                s = p.manager.list((tuple(s), 1))
-                semaphores[uid] = s
-                locker.release()
-                setup_locker = p.setup_priority_lockers.get(uid)
-                if setup_locker is not None:
-                    [setup_locker.release() for _ in range(total)]
-                    del p.setup_priority_lockers[uid]
-                break
-        s[0][order - 1].acquire()
-
-    def unlock_code(self, uid: Union[str, int]):
-        semaphores = p.semaphores
-        s = semaphores.get(uid)
-        total = len(s[0])
-        order = s[1]
-        s[1] = (s[1] + 1) % total
-        s[0][order % total].release()
+        assert weight > 0
+        client = get_client(self)
+        registry = client.registry(uid)
+        detector = client.detector
+        if detector is not None:
+            detector.waiting_for(uid, order)
+            current = registry.total(client.key, uid)
+            if current is not None and total is not None and total != current:
+                detector.misuse(f'uid {uid!r} was set up with total {current}, but order {order} was called '
+                                f'with total {total}')
+        since = 0 if client.profiler is None else time_ns()
+        if client.spinner is None:
+            result = registry.lock(client.key, uid, order, total, max_threads, pid=client.pid, weight=weight)
+        else:
+            result = client.spinner.acquire(uid, partial(registry.lock, client.key, uid, order, total, max_threads,
+                                                         pid=client.pid, weight=weight))
+        try:
+            check_owner(uid, result)
+        except BaseException:
+            # A warning turned into an error doesn't leave the uid held, since the caller never gets to unlock it
+            registry.unlock(client.key, uid, client.pid, weight)
+            raise
+        if detector is not None:
+            detector.acquired(uid, order)
+        if client.profiler is not None:
+            client.profiler.acquired(uid, order, since)
+        return result
+
+    def unlock_code(self, uid: Union[str, int], weight: int = 1):
+        client = get_client(self)
+        registry = client.registry(uid)
+        detector = client.detector
+        if detector is not None:
+            detector.released(uid)
+            if registry.total(client.key, uid) is None:
+                detector.misuse(f'unlock_code was called for uid {uid!r}, which has never been locked')
+        if client.spinner is not None:
+            client.spinner.released(uid)
+        if client.profiler is not None:
+            client.profiler.released(uid)
+        registry.unlock(client.key, uid, client.pid, weight)
+        if waiters:
+            wakeup.set()
+
+    def stop_detector(self):
+        # Only the watchdog of the current process is stopped, since every process has its own copy of the detector
+        detector = get_client(self).detector
+        if detector is not None:
+            detector.stop()
 
     class Monitor(AbstractMonitor):
         '''
@@ -68,40 +303,154 @@ def Monitor():
         'lock_code()' and 'lock_priority_code()' since they share the same namespace.
         '''
 
-        def __init__(self):
+        def __init__(self, shards: int = 1):
+            '''
+            :param shards: Number of independent shards the uids are spread across, each one served by its own manager
+                process. The managers of all but the first shard are started when a uid of their shard is first used.
+            '''
             p.register_instance(self)
+            p.detector = None
+            p.spinner = None
+            p.profiler = None
+            attach_client(self, [root] + [None] * (shards - 1), uuid4().hex)
+
+        def lock_code(self, uid: Union[str, int], max_threads: int = 1, weight: int = 1) -> int:
+            return lock_priority_code(self, uid=uid, order=1, total=1, max_threads=max_threads, weight=weight)
+
+        def lock_priority_code(self, uid: Union[str, int], order: int, total: int = None) -> int:
+            return lock_priority_code(self, uid=uid, order=order, total=total, max_threads=1)
+
+        def unlock_code(self, uid: Union[str, int], weight: int = 1):
+            unlock_code(self, uid=uid, weight=weight)
+
+        async def acquire_async(self, uid: Union[str, int], max_threads: int = 1, weight: int = 1) -> int:
+            assert weight > 0
+            client = get_client(self)
+            loop = asyncio.get_running_loop()
+            # The coroutine keeps its place in the queue of the uid between the tries of the notifier
+            waiter = Waiter(client.registry(uid), client.key, uid, max_threads, weight, (os.getpid(), uuid4().hex), loop,
+                            loop.create_future())
+            with waiters_lock:
+                waiters.append(waiter)
+            since = time_ns()
+            start_notifier()
+            wakeup.set()
+            try:
+                result = await waiter.future
+            except BaseException:
+                # The notifier withdraws the ticket of the coroutine right away
+                wakeup.set()
+                raise
+            try:
+                check_owner(uid, result)
+            except BaseException:
+                waiter.registry.unlock(client.key, uid, client.pid, weight)
+                raise
+            if client.profiler is not None:
+                client.profiler.acquired(uid, 1, since)
+            return result
+
+        def lock_many(self, uids: Iterable[Union[str, int]], max_threads: int = 1):
+            client = get_client(self)
+            if client.detector is not None or client.spinner is not None or client.profiler is not None:
+                return super().lock_many(uids, max_threads)
+            # Consecutive uids of the same shard are taken in a single round trip, keeping the canonical order
+            locked = []
+            try:
+                for registry, run in groupby(self.canonical_order(uids), client.registry):
+                    run = list(run)
+                    results = registry.lock_many(client.key, run, max_threads, client.pid)
+                    locked.extend(run)
+                    [check_owner(uid, result) for uid, result in zip(run, results)]
+            except BaseException:
+                self.unlock_many(locked)
+                raise
 
-            # This attribute will store a tuple of semaphores per uid, so it'll be like:
-            # semaphores = {'uid1': [(s1,), order], 'uid2': [(s2, s3, s4), order], ...}
-            p.semaphores = p.manager.dict()
-            p.setup_priority_lockers = p.manager.dict()
+        def unlock_many(self, uids: Iterable[Union[str, int]]):
+            client = get_client(self)
+            if client.detector is not None or client.spinner is not None or client.profiler is not None:
+                return super().unlock_many(uids)
+            for registry, run in groupby(self.canonical_order(uids)[::-1], client.registry):
+                registry.unlock_many(client.key, list(run), client.pid)
 
-        def lock_code(self, uid: Union[str, int], max_threads: int = 1):
-            lock_priority_code(self, uid=uid, order=1, total=1, max_threads=max_threads)
+        def enable_deadlock_detection(self, timeout: float = 5, on_deadlock: Callable[[str], Any] = None):
+            stop_detector(self)
+            p.detector = DeadlockDetector(timeout, on_deadlock, holding=p.manager.dict(), waiting=p.manager.dict(),
+                                          reported=p.manager.dict())
+            refresh_client(self, get_client(self))
 
-        def lock_priority_code(self, uid: Union[str, int], order: int, total: int = None):
-            lock_priority_code(self, uid=uid, order=order, total=total, max_threads=1)
+        def disable_deadlock_detection(self):
+            stop_detector(self)
+            p.detector = None
+            refresh_client(self, get_client(self))
 
-        def unlock_code(self, uid: Union[str, int]):
-            unlock_code(self, uid=uid)
+        def enable_spinning(self, max_spins: int = 100, max_hold: float = 0.0001):
+            p.spinner = (max_spins, max_hold)
+            refresh_client(self, get_client(self))
+
+        def disable_spinning(self):
+            p.spinner = None
+            refresh_client(self, get_client(self))
+
+        def enable_profiling(self, capacity: int = 65536, directory: str = None) -> Profiler:
+            p.profiler = (capacity, directory)
+            return refresh_client(self, get_client(self)).profiler
+
+        def disable_profiling(self):
+            p.profiler = None
+            refresh_client(self, get_client(self))
 
         def __getstate__(self):
+            client = get_client(self)
             state = dict(self.__dict__)
             state['private'] = p.getstate(self)
+            state['registries'] = client.registries
+            state['key'] = client.key
             return state
 
         def __setstate__(self, state):
             private = state.pop('private')
+            registries, key = state.pop('registries'), state.pop('key')
             p.setstate(self, private)
             self.__dict__ = state
+            attach_client(self, registries, key)
+
+        def __reduce__(self):
+            handle = handles.get(id(self))
+            if handle is None:
+                token = uuid4().hex
+                handle = handles[id(self)] = (token, pickle.dumps(self.__getstate__()))
+                monitors[token] = self
+            return Monitor.attach, handle
+
+        @staticmethod
+        def attach(token: str, state: bytes):
+            monitor = attached.pop(token, None)
+            if monitor is None:
+                monitor = monitors.get(token)
+                if monitor is not None:
+                    return monitor
+                monitor = Monitor.__new__(Monitor)
+                monitor.__setstate__(pickle.loads(state))
+                handles[id(monitor)] = (token, state)
+                monitors[token] = monitor
+            attached[token] = monitor
+            if len(attached) > KEPT_ATTACHED:
+                attached.popitem(last=False)
+            return monitor
 
         def __del__(self):
+            handles.pop(id(self), None)
+            client = clients.pop(id(self), None)
+            if client is not None and client.detector is not None:
+                client.detector.stop()
             p.delete(self)
 
     Monitor.__qualname__ = 'Monitor'
+    Monitor.attach.__qualname__ = 'Monitor.attach'
 
     return Monitor
 
 
 Monitor = Monitor()
-StaticMonitor = Monitor()
+StaticMonitor = Monitor(shards=4)
@@ -0,0 +1,133 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import multiprocessing
+import os
+from concurrent.futures import wait
+from concurrent.futures._base import Future
+from concurrent.futures.process import BrokenProcessPool, ProcessPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Iterable, Iterator, Sequence
+
+from parallel_utils.common import pool_worker
+
+
+class ProcessPool:
+    '''
+    A pool of long-lived worker processes. Unlike 'create_process', which starts a cold interpreter for every call,
+    these workers are reused between tasks, so the modules and state loaded by 'preload' and 'initializer' are only
+    loaded once per worker.
+    '''
+
+    def __init__(self, max_workers: int = None, initializer: Callable = None, initargs: Sequence[Any] = (),
+                 preload: Iterable[str] = (), start_method: str = None, max_tasks_per_child: int = None):
+        '''
+        :param max_workers: Maximum number of worker processes. Defaults to the number of CPUs.
+        :param initializer: A function called once in every worker before it runs any task.
+        :param initargs: The initializer arguments.
+        :param preload: Names of the modules every worker must import at startup. With the 'forkserver' start method
+        they are also imported by the fork server itself, so new workers are forked already warm. There is a single
+        fork server per process, so this replaces its preload list for every later forkserver process, and has no
+        effect on the server if it was already started.
+        :param start_method: 'fork', 'forkserver' or 'spawn'. Defaults to the multiprocessing default.
+        :param max_tasks_per_child: Number of tasks a worker runs before being replaced by a fresh one. Requires
+        Python 3.11+ and a start method other than 'fork'.
+        '''
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.preload = tuple(preload)
+        self.initializer = initializer
+        self.initargs = tuple(initargs)
+        self.max_tasks_per_child = max_tasks_per_child
+        self.context = multiprocessing.get_context(start_method)
+        if self.context.get_start_method() == 'forkserver' and self.preload:
+            self.context.set_forkserver_preload(list(self.preload))
+        self._lock = Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        kwargs = {}
+        if self.max_tasks_per_child is not None:
+            kwargs['max_tasks_per_child'] = self.max_tasks_per_child
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self.context, initializer=pool_worker.init_worker,
+                                   initargs=(self.preload, self.initializer, self.initargs), **kwargs)
+
+    def restart(self):
+        '''
+        Replaces every worker with a fresh one. Pending tasks of the old workers are cancelled.
+        '''
+        with self._lock:
+            old, self._executor = self._executor, self._new_executor()
+        old.shutdown(wait=False, cancel_futures=True)
+
+    def _replace_broken(self, broken: ProcessPoolExecutor):
+        '''
+        Replaces a broken executor, unless another thread has already done it, so that the tasks submitted to the new
+        one are never cancelled.
+        '''
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = self._new_executor()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, func: Callable, *args: Any, **kwargs: Any) -> Future:
+        '''
+        Calls a function in one of the workers of the pool. If the pool was broken by a worker that died abruptly,
+        it is restarted before submitting the call.
+        :param func: The function to be called
+        :param args: The function arguments
+        :param kwargs: The function keyword arguments
+        :return: The created Future object, from which we can call 'result()' to get the function return value.
+        '''
+        executor = self._executor
+        try:
+            return executor.submit(func, *args, **kwargs)
+        except BrokenProcessPool:
+            self._replace_broken(executor)
+            return self._executor.submit(func, *args, **kwargs)
+
+    def map(self, func: Callable, *iterables: Iterable, timeout: float = None, chunksize: int = 1) -> Iterator:
+        '''
+        Same as the built-in 'map', but every call runs in the workers of the pool.
+        :param func: The function to be called
+        :param iterables: The iterables the function arguments are taken from
+        :param timeout: Maximum number of seconds to wait for every result.
+        :param chunksize: Number of calls sent to a worker at once.
+        '''
+        return self._executor.map(func, *iterables, timeout=timeout, chunksize=chunksize)
+
+    def check_health(self, timeout: float = 5) -> bool:
+        '''
+        Sends a no-op task to the pool to find out whether it was broken by a worker that died abruptly, in which case
+        it is restarted. A pool that is just busy is healthy, so its pending tasks are never cancelled.
+        :param timeout: Maximum number of seconds to wait for the answer.
+        :return: True if the pool was healthy, False if it had to be restarted.
+        '''
+        executor = self._executor
+        try:
+            ping = executor.submit(pool_worker.ping)
+            wait([ping], timeout=timeout)
+            if ping.done():
+                ping.result()
+            else:
+                # The workers are busy, but a broken pool would have failed the ping right away
+                ping.cancel()
+        except BrokenProcessPool:
+            self._replace_broken(executor)
+            return False
+        return True
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        '''
+        Frees the resources of the pool. No more calls can be submitted after this.
+        :param wait: Whether to block until every pending call has finished.
+        :param cancel_futures: Whether to cancel the calls that haven't started yet.
+        '''
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown(wait=True)
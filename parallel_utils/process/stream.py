@@ -0,0 +1,204 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import asyncio
+from collections import deque
+from multiprocessing import Pipe, Process, Semaphore
+from multiprocessing.connection import Connection
+from threading import Condition, Thread
+from time import monotonic
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, Tuple
+
+# The kinds of messages sent by the child process
+ITEMS, DONE, ERROR = range(3)
+
+
+def send_error(writer: Connection, error: BaseException):
+    try:
+        writer.send((ERROR, error))
+    except Exception as e:
+        # The exception couldn't be pickled
+        writer.send((ERROR, RuntimeError(f'the exception of the process could not be sent: {error!r} ({e!r})')))
+
+
+class Sender:
+    '''
+    Sends the items of the child process in batches from a thread of its own, so that a batch is sent as soon as it is
+    full or its first item has waited for 'linger' seconds, even while the generator is busy producing the next item.
+    Every batch takes a credit, which the parent gives back when it receives it, so the child blocks when the parent
+    falls behind.
+    '''
+
+    def __init__(self, writer: Connection, credits: Semaphore, batch_size: int, linger: float):
+        self.writer = writer
+        self.credits = credits
+        self.batch_size = batch_size
+        self.linger = linger
+        self.condition = Condition()
+        self.batch = []
+        # When the first item of the batch was added
+        self.since = 0
+        self.closed = False
+        self.error = None
+        self.thread = Thread(target=self.run, name='StreamSender', daemon=True)
+        self.thread.start()
+
+    def add(self, item: Any):
+        with self.condition:
+            # A full batch is only filled again once the thread has taken it, so memory stays bounded
+            self.condition.wait_for(lambda: len(self.batch) < self.batch_size or self.error is not None)
+            if self.error is not None:
+                raise self.error
+            if not self.batch:
+                self.since = monotonic()
+            self.batch.append(item)
+            self.condition.notify_all()
+
+    def close(self):
+        '''
+        Sends the items left, and waits for the thread to finish.
+        '''
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def run(self):
+        try:
+            while True:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.batch or self.closed)
+                    if not self.batch:
+                        return
+                # The batch is only taken once it can be sent, so that no other one is filled meanwhile
+                self.credits.acquire()
+                with self.condition:
+                    self.condition.wait_for(lambda: len(self.batch) >= self.batch_size or self.closed,
+                                            self.since + self.linger - monotonic())
+                    items, self.batch = self.batch, []
+                    self.condition.notify_all()
+                self.writer.send((ITEMS, items))
+        except BaseException as e:
+            with self.condition:
+                self.error = e
+                self.condition.notify_all()
+
+
+def produce(writer: Connection, credits: Semaphore, func: Callable[..., Iterable[Any]], args: Tuple[Any, ...],
+            kwargs: Dict[str, Any], batch_size: int, linger: float):
+    '''
+    Runs in the child process, sending the items yielded by func in batches.
+    '''
+    try:
+        sender = Sender(writer, credits, batch_size, linger)
+        try:
+            for item in func(*args, **kwargs):
+                sender.add(item)
+        finally:
+            # The items already produced are sent even if func fails afterwards
+            sender.close()
+        writer.send((DONE, None))
+    except BaseException as e:
+        send_error(writer, e)
+    finally:
+        writer.close()
+
+
+class ProcessStream:
+    '''
+    Iterates, synchronously or asynchronously, over the items a generator yields in its own process, as soon as they
+    are produced, instead of waiting for the whole list to be built and pickled back at the end.
+    '''
+
+    def __init__(self, func: Callable[..., Iterable[Any]], args: Iterable[Any] = (), kwargs: Dict[str, Any] = None,
+                 batch_size: int = 64, max_batches: int = 4, linger: float = 0.01):
+        '''
+        :param func: A function that returns an iterable, usually a generator function.
+        :param args: The function arguments.
+        :param kwargs: The function keyword arguments.
+        :param batch_size: Maximum number of items sent together through the pipe.
+        :param max_batches: Maximum number of batches sent but not consumed yet. When reached, the child process blocks
+        until the parent catches up, so memory stays bounded no matter how many items are produced.
+        :param linger: Maximum number of seconds the first item of a batch waits in the child for others to be sent
+        with it, even if the generator is still busy producing the next one.
+        '''
+        self.items = deque()
+        self.finished = False
+        self.credits = Semaphore(max_batches)
+        self.reader, writer = Pipe(duplex=False)
+        self.process = Process(target=produce, args=(writer, self.credits, func, tuple(args), kwargs or {}, batch_size,
+                                                     linger), daemon=True)
+        self.process.start()
+        # The child holds the only writer left, so the reader gets EOFError as soon as the child dies
+        writer.close()
+
+    def receive(self) -> bool:
+        '''
+        Blocks until the next batch arrives.
+        :return: Whether there may be more items.
+        '''
+        try:
+            kind, payload = self.reader.recv()
+        except EOFError:
+            self.finish()
+            raise ChildProcessError(f'the process of the stream exited with code {self.process.exitcode}')
+        if kind == ITEMS:
+            self.credits.release()
+            self.items.extend(payload)
+            return True
+        self.finish()
+        if kind == ERROR:
+            raise payload
+        return False
+
+    def finish(self):
+        self.finished = True
+        self.reader.close()
+        self.process.join()
+
+    def close(self):
+        '''
+        Stops the child process if it's still running, and discards the items not consumed yet.
+        '''
+        if not self.finished:
+            self.process.terminate()
+            self.finish()
+        self.items.clear()
+
+    def __iter__(self) -> Iterator[Any]:
+        return self
+
+    def __next__(self) -> Any:
+        while not self.items:
+            if self.finished or not self.receive():
+                raise StopIteration
+        return self.items.popleft()
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self
+
+    async def __anext__(self) -> Any:
+        while not self.items:
+            if self.finished or not await asyncio.get_running_loop().run_in_executor(None, self.receive):
+                raise StopAsyncIteration
+        return self.items.popleft()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def create_process_stream(func: Callable[..., Iterable[Any]], *args: Any, **kwargs: Any) -> ProcessStream:
+    '''
+    Calls a generator function in its own process, and streams the items it yields
+    :param func: The function to be called
+    :param args: The function arguments
+    :param kwargs: The function keyword arguments
+    :return: A ProcessStream, which can be iterated with 'for' or 'async for' as the items are produced.
+    '''
+    return ProcessStream(func, args, kwargs)
@@ -0,0 +1,70 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+from concurrent.futures import Future
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from threading import Thread
+from typing import Any, Callable, Dict, Tuple
+
+from parallel_utils.common import AbstractTaskGroup
+
+
+def run_task(writer: Connection, func: Callable, args: Tuple[Any, ...], kwargs: Dict[str, Any]):
+    try:
+        outcome = (True, func(*args, **kwargs))
+    except BaseException as e:
+        outcome = (False, e)
+    try:
+        writer.send(outcome)
+    except Exception as e:
+        # The result or the exception couldn't be pickled
+        writer.send((False, RuntimeError(f'the outcome of the task could not be sent: {e!r}')))
+
+
+class TaskGroup(AbstractTaskGroup):
+    '''
+    A task group whose tasks run in their own processes, which are terminated when the tasks are cancelled.
+    '''
+
+    def __init__(self, timeout: float = None):
+        super().__init__(timeout)
+        # processes = {future: process}
+        self.processes = {}
+
+    def start_task(self, func: Callable, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Future:
+        future = Future()
+        reader, writer = Pipe(duplex=False)
+        process = Process(target=run_task, args=(writer, func, args, kwargs))
+        process.start()
+        # The child holds the only writer left, so the reader gets EOFError as soon as the child dies
+        writer.close()
+        self.processes[future] = process
+        Thread(target=self.watch, args=(future, process, reader), daemon=True).start()
+        return future
+
+    def watch(self, future: Future, process: Process, reader: Connection):
+        try:
+            succeeded, value = reader.recv()
+        except EOFError:
+            process.join()
+            if self.cancelled.is_set():
+                # Unlike cancel(), set_running_or_notify_cancel() of a cancelled future also wakes up wait()
+                future.cancel()
+                future.set_running_or_notify_cancel()
+            else:
+                future.set_exception(ChildProcessError(f'the process of the task exited with code {process.exitcode}'))
+            return
+        finally:
+            reader.close()
+        process.join()
+        if succeeded:
+            future.set_result(value)
+        else:
+            future.set_exception(value)
+
+    def cancel_tasks(self):
+        for future, process in self.processes.items():
+            if not future.done():
+                process.terminate()
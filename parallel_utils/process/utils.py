@@ -2,6 +2,7 @@
 # encoding:utf-8
 
 
+import asyncio
 from concurrent.futures._base import Future
 from concurrent.futures.process import ProcessPoolExecutor
 from typing import Callable, Any
@@ -19,3 +20,14 @@ def create_process(func: Callable, *args: Any, **kwargs: Any) -> Future:
     future = tp.submit(func, *args, **kwargs)
     tp.shutdown(wait=False)
     return future
+
+
+async def create_process_async(func: Callable, *args: Any, **kwargs: Any) -> Any:
+    '''
+    Calls a function in its own process and awaits its result, without blocking the running event loop
+    :param func: The function to be called
+    :param args: The function arguments
+    :param kwargs: The function keyword arguments
+    :return: The function return value.
+    '''
+    return await asyncio.wrap_future(create_process(func, *args, **kwargs))
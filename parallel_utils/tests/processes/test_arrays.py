@@ -0,0 +1,72 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import os
+import tempfile
+from unittest import TestCase, main, skipUnless
+
+from parallel_utils.process import map_array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def square(chunk):
+    return chunk ** 2
+
+
+def row_sums(chunk):
+    return chunk.sum(axis=1)
+
+
+def chunk_pid(chunk):
+    return numpy.full(len(chunk), os.getpid())
+
+
+def fail(chunk):
+    raise ValueError('boom')
+
+
+@skipUnless(numpy, 'NumPy is not installed')
+class TestMapArray(TestCase):
+
+    def test_map(self):
+        array = numpy.arange(1000, dtype=numpy.float64)
+        result = map_array(square, array, chunks=4)
+        numpy.testing.assert_array_equal(array ** 2, result)
+
+    def test_every_chunk_runs_in_its_own_process(self):
+        result = map_array(chunk_pid, numpy.zeros(100), dtype=numpy.int64, chunks=4)
+        self.assertEqual(4, len(set(result)))
+        self.assertNotIn(os.getpid(), result)
+
+    def test_output_array(self):
+        array = numpy.arange(60).reshape(20, 3)
+        out = numpy.zeros(20, dtype=array.dtype)
+        self.assertIs(out, map_array(row_sums, array, out=out, chunks=3))
+        numpy.testing.assert_array_equal(array.sum(axis=1), out)
+
+    def test_memory_mapped_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            array = numpy.memmap(os.path.join(directory, 'in'), numpy.int32, 'w+', shape=(1000,))
+            array[:] = numpy.arange(1000)
+            array.flush()
+            out = numpy.memmap(os.path.join(directory, 'out'), numpy.int32, 'w+', shape=(1000,))
+            map_array(square, array, out=out, chunks=4)
+            written = numpy.memmap(os.path.join(directory, 'out'), numpy.int32, 'r', shape=(1000,))
+            numpy.testing.assert_array_equal(numpy.arange(1000) ** 2, written)
+            del array, out, written
+
+    def test_exceptions_are_raised(self):
+        with self.assertRaises(ValueError):
+            map_array(fail, numpy.zeros(10), chunks=2)
+
+    def test_empty_array(self):
+        self.assertEqual(0, len(map_array(square, numpy.zeros(0))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import asyncio
+import time
+from unittest import TestCase, main
+
+from parallel_utils.process import Monitor, create_process, create_process_async
+
+m = Monitor()
+
+
+class TestAsync(TestCase):
+
+    @staticmethod
+    async def one_second(uid):
+        async with m.synchronized_async(uid):
+            await asyncio.sleep(1)
+
+    @staticmethod
+    def one_second_process(uid):
+        with m.synchronized(uid):
+            time.sleep(1)
+
+    @staticmethod
+    def hold(uid, seconds):
+        with m.synchronized(uid):
+            time.sleep(seconds)
+        return time.time()
+
+    def test_coroutines_and_processes(self):
+        async def run():
+            processes = [create_process(self.one_second_process, 'test1') for _ in range(2)]
+            await asyncio.sleep(0.1)
+            await asyncio.gather(*(self.one_second('test1') for _ in range(2)))
+            await asyncio.gather(*(asyncio.wrap_future(p) for p in processes))
+
+        t1 = time.time_ns()
+        asyncio.run(run())
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 4)
+        self.assertLessEqual(delta, 4.5)
+
+    def test_many_waiters(self):
+        async def short(uid):
+            async with m.synchronized_async(uid, max_threads=10):
+                await asyncio.sleep(0.01)
+
+        async def run():
+            await asyncio.gather(*(short('test2') for _ in range(500)))
+
+        t1 = time.time_ns()
+        asyncio.run(run())
+        t2 = time.time_ns()
+        self.assertLessEqual((t2 - t1) * (10 ** -9), 5)
+
+    def test_waiters_of_a_closed_loop(self):
+        m.lock_code('test3')
+        loop = asyncio.new_event_loop()
+        loop.create_task(m.acquire_async('test3'))
+        loop.run_until_complete(asyncio.sleep(0.1))
+        loop.close()
+        m.unlock_code('test3')
+        asyncio.run(asyncio.wait_for(m.acquire_async('test3'), 1))
+        m.unlock_code('test3')
+
+    def test_unlocks_of_other_processes_wake_coroutines_up(self):
+        delays = []
+        for _ in range(5):
+            holder = create_process(self.hold, 'test4', 0.3)
+            time.sleep(0.1)
+            asyncio.run(asyncio.wait_for(m.acquire_async('test4'), 5))
+            delays.append(time.time() - holder.result())
+            m.unlock_code('test4')
+        self.assertLess(sorted(delays)[2], 0.015)
+
+    def test_create_process_async(self):
+        async def run():
+            return await asyncio.gather(create_process_async(pow, 2, 10), create_process_async(pow, 3, 2))
+
+        self.assertEqual([1024, 9], asyncio.run(run()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import time
+from queue import Empty, Full
+from unittest import TestCase, main
+
+from parallel_utils.process import Channel, ChannelClosed, create_process
+
+channel = Channel(maxsize=4, capacity=256)
+
+
+class TestChannel(TestCase):
+
+    @staticmethod
+    def produce(n):
+        with channel:
+            for i in range(n):
+                channel.put({'item': i})
+
+    def test_producer_consumer(self):
+        producer = create_process(self.produce, 200)
+        results = [item['item'] for item in channel]
+        producer.result()
+        self.assertEqual(list(range(200)), results)
+
+    def test_ring_buffer(self):
+        c = Channel(maxsize=100, capacity=64)
+        self.assertRaises(ValueError, c.put, 'x' * 100)
+        self.assertRaises(Empty, c.get, timeout=0.1)
+        for i in range(50):
+            self.assertEqual(2, c.put_many([b'0123456789', b'abcdefghij'], timeout=0))
+            self.assertRaises(Full, c.put, b'x' * 40, timeout=0)
+            self.assertEqual([b'0123456789', b'abcdefghij'], c.get_many(5))
+        c.close()
+        self.assertRaises(ChannelClosed, c.get)
+        t1 = time.time_ns()
+        self.assertRaises(ChannelClosed, c.put, 'x')
+        self.assertLess((time.time_ns() - t1) * (10 ** -9), 0.1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import concurrent.futures
+import os
+import subprocess
+import sys
+from threading import Barrier
+from unittest import TestCase, main, skipUnless
+
+from parallel_utils.process import Monitor
+from parallel_utils.thread import create_thread
+
+m = Monitor()
+barrier = Barrier(21)
+
+
+class TestConnections(TestCase):
+
+    @staticmethod
+    def lock_many_uids(n):
+        for uid in range(20):
+            with m.synchronized(f'{n}-{uid}'):
+                pass
+        barrier.wait()
+        barrier.wait()
+
+    @skipUnless(os.path.isdir('/proc/self/fd'), 'needs /proc/self/fd')
+    def test_one_connection_per_thread(self):
+        before = len(os.listdir('/proc/self/fd'))
+        threads = [create_thread(self.lock_many_uids, n) for n in range(20)]
+        barrier.wait()
+        during = len(os.listdir('/proc/self/fd'))
+        barrier.wait()
+        concurrent.futures.wait(threads)
+        self.assertLessEqual(during - before, 25)
+
+    def test_import_with_spawn(self):
+        # The managers are spawned too, and they must not start managers of their own while they are bootstrapping
+        code = ("import multiprocessing; multiprocessing.set_start_method('spawn'); "
+                "from parallel_utils.process import Monitor; m = Monitor(); m.lock_code('uid'); m.unlock_code('uid')")
+        completed = subprocess.run([sys.executable, '-c', code], capture_output=True, timeout=60,
+                                   env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+        self.assertEqual(0, completed.returncode, completed.stderr.decode())
+
+
+if __name__ == '__main__':
+    main()
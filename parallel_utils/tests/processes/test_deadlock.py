@@ -0,0 +1,39 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import concurrent.futures
+import time
+from multiprocessing import Manager
+from unittest import TestCase, main
+
+from parallel_utils.process import Monitor, create_process
+
+m = Monitor()
+reports = Manager().list()
+m.enable_deadlock_detection(timeout=1, on_deadlock=reports.append)
+
+
+class TestDeadlock(TestCase):
+
+    @staticmethod
+    def f1():
+        time.sleep(2)
+        with m.synchronized_priority('test', 1, 2):
+            pass
+
+    @staticmethod
+    def f2():
+        with m.synchronized_priority('test', 2, 2):
+            pass
+
+    def test_stalled_priority_chain(self):
+        processes = [create_process(self.f2), create_process(self.f1)]
+        concurrent.futures.wait(processes)
+        self.assertEqual(1, len(reports))
+        self.assertIn('stalled priority chain', reports[0])
+        self.assertIn("waits for uid 'test' (order 2)", reports[0])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import concurrent.futures
+import time
+from unittest import TestCase, main
+
+from parallel_utils.process import Monitor, create_process
+
+m = Monitor()
+
+
+class TestMany(TestCase):
+
+    @staticmethod
+    def lock_in_order(uids):
+        for _ in range(50):
+            with m.synchronized_many(uids):
+                pass
+
+    @staticmethod
+    def one_second(uids):
+        with m.synchronized_many(uids):
+            time.sleep(1)
+
+    def test_opposite_orders_do_not_deadlock(self):
+        processes = [create_process(self.lock_in_order, ['a', 'b', 1]),
+                     create_process(self.lock_in_order, [1, 'b', 'a'])]
+        done, not_done = concurrent.futures.wait(processes, timeout=10)
+        self.assertEqual(0, len(not_done))
+        for p in done:
+            self.assertIsNone(p.exception())
+
+    def test_overlapping_sets_are_exclusive(self):
+        t1 = time.time_ns()
+        processes = [create_process(self.one_second, ['x', 'y']), create_process(self.one_second, ['y', 'z']),
+                     create_process(self.one_second, ['z'])]
+        concurrent.futures.wait(processes)
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 2)
+        self.assertLessEqual(delta, 2.5)
+
+
+if __name__ == '__main__':
+    main()
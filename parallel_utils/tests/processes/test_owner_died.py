@@ -0,0 +1,88 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import asyncio
+import concurrent.futures
+import os
+import time
+import warnings
+from unittest import TestCase, main
+
+from parallel_utils.process import LOCKED, OWNER_DIED, Monitor, OwnerDiedWarning, create_process
+
+m = Monitor()
+
+
+class TestOwnerDied(TestCase):
+
+    @staticmethod
+    def die_holding(uid):
+        m.lock_code(uid)
+        os._exit(1)
+
+    @staticmethod
+    def die_holding_turn(uid):
+        m.lock_priority_code(uid, order=1, total=2)
+        os._exit(1)
+
+    @staticmethod
+    def second_turn(uid):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            with m.synchronized_priority(uid, order=2, total=2):
+                return [w.category.__name__ for w in caught]
+
+    def test_permit_is_taken_back(self):
+        concurrent.futures.wait([create_process(self.die_holding, 'test1')])
+        t1 = time.time_ns()
+        with self.assertWarns(OwnerDiedWarning):
+            with m.synchronized('test1'):
+                pass
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertLessEqual(delta, 1.5)
+        # The signal is only given to the next holder
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            with m.synchronized('test1'):
+                pass
+
+    def test_turn_moves_on(self):
+        second = create_process(self.second_turn, 'test2')
+        time.sleep(0.5)
+        concurrent.futures.wait([create_process(self.die_holding_turn, 'test2')])
+        self.assertEqual(['OwnerDiedWarning'], second.result(timeout=5))
+
+    def test_async_waiters(self):
+        async def run():
+            async with m.synchronized_async('test3'):
+                pass
+
+        concurrent.futures.wait([create_process(self.die_holding, 'test3')])
+        with self.assertWarns(OwnerDiedWarning):
+            asyncio.run(asyncio.wait_for(run(), 5))
+
+    def test_status_is_returned_every_time(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            for _ in range(3):
+                concurrent.futures.wait([create_process(self.die_holding, 'test4')])
+                with m.synchronized('test4') as status:
+                    self.assertEqual(OWNER_DIED, status)
+            self.assertEqual(LOCKED, m.lock_code('test4'))
+            m.unlock_code('test4')
+
+    def test_warning_as_error_releases_the_uid(self):
+        concurrent.futures.wait([create_process(self.die_holding, 'test5')])
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', OwnerDiedWarning)
+            with self.assertRaises(OwnerDiedWarning):
+                with m.synchronized('test5'):
+                    pass
+        self.assertEqual(LOCKED, create_process(m.lock_code, 'test5').result(timeout=5))
+        m.unlock_code('test5')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import concurrent.futures
+import gc
+import pickle
+import time
+from unittest import TestCase, main
+
+from parallel_utils.process import Monitor, ProcessPool, create_process
+
+
+def identity(monitor):
+    return id(monitor)
+
+
+def count_monitors(monitor=None):
+    gc.collect()
+    return sum(isinstance(o, Monitor) for o in gc.get_objects())
+
+
+def one_second(monitor):
+    with monitor.synchronized('test'):
+        time.sleep(1)
+
+
+class TestPickle(TestCase):
+
+    def test_handle_is_reused(self):
+        m = Monitor()
+        data = pickle.dumps(m)
+        self.assertLess(len(data), 1024)
+        self.assertEqual(data, pickle.dumps(m))
+        self.assertIs(m, pickle.loads(data))
+
+    def test_attached_once_per_process(self):
+        m = Monitor()
+        with ProcessPool(max_workers=1, start_method='spawn') as pool:
+            ids = {pool.submit(identity, m).result() for _ in range(5)}
+        self.assertEqual(1, len(ids))
+
+    def test_attached_monitors_are_released(self):
+        with ProcessPool(max_workers=1) as pool:
+            before = pool.submit(count_monitors).result()
+            for _ in range(30):
+                pool.submit(count_monitors, Monitor()).result()
+            self.assertLessEqual(pool.submit(count_monitors).result() - before, 16)
+
+    def test_monitor_as_argument(self):
+        m = Monitor()
+        t1 = time.time_ns()
+        concurrent.futures.wait([create_process(one_second, m) for _ in range(3)])
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 3)
+        self.assertLessEqual(delta, 3.5)
+
+
+if __name__ == '__main__':
+    main()
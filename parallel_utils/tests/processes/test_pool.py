@@ -0,0 +1,88 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import os
+import sys
+import time
+from unittest import TestCase, main, skipIf
+
+from parallel_utils.process import ProcessPool
+from parallel_utils.thread import create_thread
+
+state = {}
+
+
+def load_state(value):
+    time.sleep(1)
+    state['value'] = value
+    state['loads'] = state.get('loads', 0) + 1
+
+
+def read_state():
+    return os.getpid(), state.get('value'), state.get('loads'), 'colorsys' in sys.modules
+
+
+def crash():
+    os._exit(1)
+
+
+def one_second():
+    time.sleep(1)
+
+
+class TestPool(TestCase):
+
+    def test_initializer_runs_once_per_worker(self):
+        with ProcessPool(max_workers=2, initializer=load_state, initargs=(42,), preload=['colorsys']) as pool:
+            pool.check_health()
+            t1 = time.time_ns()
+            results = [pool.submit(read_state).result() for _ in range(10)]
+            t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertLessEqual(delta, 0.5)
+        self.assertLessEqual(len({pid for pid, _, _, _ in results}), 2)
+        for _, value, loads, preloaded in results:
+            self.assertEqual(42, value)
+            self.assertEqual(1, loads)
+            self.assertTrue(preloaded)
+
+    @skipIf(sys.version_info < (3, 11), 'max_tasks_per_child requires Python 3.11+')
+    def test_max_tasks_per_child(self):
+        with ProcessPool(max_workers=1, start_method='forkserver', max_tasks_per_child=2) as pool:
+            pids = [pool.submit(os.getpid).result() for _ in range(4)]
+        self.assertEqual(2, len(set(pids)))
+
+    def test_workers_do_not_import_the_process_package(self):
+        # Importing it would start the managers of its monitors in every worker
+        with ProcessPool(max_workers=1, start_method='forkserver', preload=['colorsys']) as pool:
+            imported = pool.submit(eval, "'parallel_utils.process' in __import__('sys').modules").result()
+        self.assertFalse(imported)
+
+    def test_health_check_restarts_broken_pool(self):
+        with ProcessPool(max_workers=1) as pool:
+            pid = pool.submit(os.getpid).result()
+            pool.submit(crash)
+            time.sleep(0.5)
+            self.assertFalse(pool.check_health())
+            self.assertTrue(pool.check_health())
+            self.assertNotEqual(pid, pool.submit(os.getpid).result())
+
+    def test_health_check_keeps_busy_pool(self):
+        with ProcessPool(max_workers=2) as pool:
+            pool.check_health()
+            futures = [pool.submit(one_second) for _ in range(6)]
+            self.assertTrue(pool.check_health(timeout=0.5))
+            [f.result() for f in futures]
+            self.assertFalse(any(f.cancelled() for f in futures))
+
+    def test_concurrent_submits_restart_broken_pool_once(self):
+        with ProcessPool(max_workers=1) as pool:
+            pool.submit(crash)
+            time.sleep(0.5)
+            futures = [f.result() for f in [create_thread(pool.submit, os.getpid) for _ in range(4)]]
+            self.assertEqual(1, len({f.result() for f in futures}))
+
+
+if __name__ == '__main__':
+    main()
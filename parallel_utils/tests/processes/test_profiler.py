@@ -0,0 +1,44 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import concurrent.futures
+import tempfile
+import time
+from unittest import TestCase, main
+
+from parallel_utils.common import Profiler
+from parallel_utils.process import Monitor, create_process
+
+m = Monitor()
+directory = tempfile.mkdtemp()
+m.enable_profiling(directory=directory)
+
+
+class TestProfiler(TestCase):
+
+    @staticmethod
+    def hold():
+        with m.synchronized('uid'):
+            time.sleep(0.5)
+
+    def test_traces_are_merged_across_processes(self):
+        concurrent.futures.wait([create_process(self.hold) for _ in range(2)])
+        # Workers write their trace when they exit, which can be slightly after their result is delivered
+        time.sleep(0.5)
+        events = Profiler.merge(directory)['traceEvents']
+        spans = [e for e in events if e['ph'] == 'X']
+        self.assertEqual(2, len({e['pid'] for e in spans}))
+        self.assertEqual(2, len([e for e in spans if e['cat'] == 'hold']))
+        self.assertGreaterEqual(max(e['dur'] for e in spans if e['cat'] == 'wait'), 400000)
+        self.assertEqual(2, len([e for e in events if e['name'] == 'process_name']))
+
+    def test_local_spans(self):
+        profiler = m.enable_profiling(directory=directory)
+        with m.synchronized('local'):
+            pass
+        self.assertEqual(['wait', 'hold'], [e['cat'] for e in profiler.export()['traceEvents'] if e['ph'] == 'X'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import concurrent.futures
+import time
+from unittest import TestCase, main
+
+from parallel_utils.process import Monitor, create_process
+
+m = Monitor(shards=3)
+
+
+class TestShards(TestCase):
+
+    @staticmethod
+    def one_second(uid):
+        with m.synchronized(uid):
+            time.sleep(1)
+
+    def test_same_uid_is_exclusive(self):
+        t1 = time.time_ns()
+        concurrent.futures.wait([create_process(self.one_second, 'shared') for _ in range(2)])
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 2)
+        self.assertLessEqual(delta, 2.5)
+
+    def test_uids_of_different_shards_run_in_parallel(self):
+        t1 = time.time_ns()
+        concurrent.futures.wait([create_process(self.one_second, i) for i in range(3)])
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 1)
+        self.assertLessEqual(delta, 1.5)
+
+    @staticmethod
+    def lock_in_order(uids):
+        for _ in range(20):
+            with m.synchronized_many(uids):
+                pass
+
+    def test_many_uids_across_shards(self):
+        processes = [create_process(self.lock_in_order, [0, 1, 2, 'a', 'b']),
+                     create_process(self.lock_in_order, ['b', 'a', 2, 1, 0])]
+        done, not_done = concurrent.futures.wait(processes, timeout=10)
+        self.assertEqual(0, len(not_done))
+        for p in done:
+            self.assertIsNone(p.exception())
+
+
+if __name__ == '__main__':
+    main()
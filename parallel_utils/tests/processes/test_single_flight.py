@@ -0,0 +1,66 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import concurrent.futures
+import time
+from multiprocessing import Manager
+from threading import Lock
+from unittest import TestCase, main
+
+from parallel_utils.process import create_process, single_flight
+
+calls = Manager().list()
+
+
+class TestSingleFlight(TestCase):
+
+    @staticmethod
+    @single_flight()
+    def one_second_computation(n):
+        calls.append(n)
+        time.sleep(1)
+        return n * 2
+
+    @staticmethod
+    @single_flight()
+    def failing_computation():
+        time.sleep(1)
+        raise ValueError('failed')
+
+    @staticmethod
+    @single_flight()
+    def unpicklable_computation():
+        time.sleep(1)
+        return Lock()
+
+    @classmethod
+    def late_call(cls):
+        time.sleep(0.3)
+        cls.unpicklable_computation()
+
+    def test_concurrent_calls_share_one_execution(self):
+        t1 = time.time_ns()
+        processes = [create_process(self.one_second_computation, 21) for _ in range(3)]
+        concurrent.futures.wait(processes)
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 1)
+        self.assertLessEqual(delta, 1.5)
+        self.assertEqual([42, 42, 42], [p.result() for p in processes])
+        self.assertEqual([21], list(calls))
+
+    def test_exception_is_shared(self):
+        processes = [create_process(self.failing_computation) for _ in range(3)]
+        concurrent.futures.wait(processes)
+        for p in processes:
+            self.assertIsInstance(p.exception(), ValueError)
+
+    def test_unpicklable_result(self):
+        follower = create_process(self.late_call)
+        self.assertIsInstance(self.unpicklable_computation(), type(Lock()))
+        self.assertIsInstance(follower.exception(timeout=5), RuntimeError)
+
+
+if __name__ == '__main__':
+    main()
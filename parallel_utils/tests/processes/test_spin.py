@@ -0,0 +1,45 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import concurrent.futures
+import time
+from multiprocessing import Manager
+from unittest import TestCase, main
+
+from parallel_utils.process import Monitor, create_process
+
+m = Monitor()
+m.enable_spinning()
+counter = Manager().Value('i', 0)
+
+
+class TestSpin(TestCase):
+
+    @staticmethod
+    def increment():
+        for _ in range(50):
+            with m.synchronized('counter'):
+                counter.value = counter.value + 1
+
+    @staticmethod
+    def one_second():
+        with m.synchronized('slow'):
+            time.sleep(1)
+
+    def test_mutual_exclusion(self):
+        processes = [create_process(self.increment) for _ in range(3)]
+        concurrent.futures.wait(processes)
+        self.assertEqual(150, counter.value)
+
+    def test_three_seconds_three_processes(self):
+        t1 = time.time_ns()
+        concurrent.futures.wait([create_process(self.one_second) for _ in range(3)])
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 3)
+        self.assertLessEqual(delta, 3.5)
+
+
+if __name__ == '__main__':
+    main()
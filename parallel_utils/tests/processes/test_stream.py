@@ -0,0 +1,91 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import asyncio
+import os
+import time
+from unittest import TestCase, main
+
+from parallel_utils.process import ProcessStream, create_process_stream
+
+
+def count(n):
+    for i in range(n):
+        yield i
+
+
+def slow(n, delay):
+    for i in range(n):
+        time.sleep(delay)
+        yield i
+
+
+def stall(delay):
+    yield 0
+    time.sleep(delay)
+    yield 1
+
+
+def fail_after(n):
+    yield from range(n)
+    raise ValueError('boom')
+
+
+def produced(path, n):
+    for i in range(n):
+        with open(path, 'w') as f:
+            f.write(str(i))
+        yield i
+
+
+class TestStream(TestCase):
+
+    def test_items(self):
+        self.assertEqual(list(range(1000)), list(create_process_stream(count, 1000)))
+
+    def test_first_item_arrives_before_the_last_one_is_produced(self):
+        t1 = time.time_ns()
+        stream = create_process_stream(slow, 5, 0.5)
+        self.assertEqual(0, next(stream))
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertLessEqual(delta, 1.5)
+        self.assertEqual([1, 2, 3, 4], list(stream))
+
+    def test_items_are_sent_while_the_next_one_is_produced(self):
+        t1 = time.time_ns()
+        stream = ProcessStream(stall, (3,), linger=0.01)
+        self.assertEqual(0, next(stream))
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertLessEqual(delta, 1)
+        self.assertEqual([1], list(stream))
+
+    def test_exceptions_are_propagated(self):
+        items = []
+        with self.assertRaises(ValueError):
+            for item in create_process_stream(fail_after, 10):
+                items.append(item)
+        self.assertEqual(list(range(10)), items)
+
+    def test_backpressure(self):
+        path = f'/tmp/parallel_utils_stream_{os.getpid()}'
+        with ProcessStream(produced, (path, 10000), batch_size=10, max_batches=2) as stream:
+            next(stream)
+            time.sleep(1)
+            with open(path) as f:
+                # Only the batches allowed in flight, and the one being filled, can have been produced
+                self.assertLess(int(f.read()), 50)
+        self.assertFalse(stream.process.is_alive())
+        os.remove(path)
+
+    def test_async(self):
+        async def run():
+            return [item async for item in create_process_stream(count, 500)]
+
+        self.assertEqual(list(range(500)), asyncio.run(run()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import os
+import time
+from unittest import TestCase, main
+
+from parallel_utils.process import TaskGroup, TaskGroupError
+
+
+def square(x):
+    return x * x
+
+
+def fail(message):
+    time.sleep(0.5)
+    raise ValueError(message)
+
+
+def spin(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+class TestTaskGroup(TestCase):
+
+    def test_results(self):
+        with TaskGroup() as group:
+            futures = [group.create_task(square, i) for i in range(5)]
+        self.assertEqual([0, 1, 4, 9, 16], [f.result() for f in futures])
+
+    def test_failure_terminates_siblings(self):
+        t1 = time.time_ns()
+        with self.assertRaises(TaskGroupError) as cm:
+            with TaskGroup() as group:
+                sibling = group.create_task(spin, 10)
+                group.create_task(fail, 'boom')
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertLessEqual(delta, 2)
+        self.assertTrue(sibling.cancelled())
+        self.assertFalse(any(process.is_alive() for process in group.processes.values()))
+        self.assertEqual(1, len(cm.exception.exceptions))
+        self.assertIsInstance(cm.exception.exceptions[0], ValueError)
+
+    def test_deadline(self):
+        t1 = time.time_ns()
+        with self.assertRaises(TaskGroupError) as cm:
+            with TaskGroup(timeout=1) as group:
+                group.create_task(spin, 10)
+                done = group.create_task(square, 3)
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 1)
+        self.assertLessEqual(delta, 2)
+        self.assertEqual(9, done.result())
+        self.assertEqual(1, len(cm.exception.exceptions))
+        self.assertIsInstance(cm.exception.exceptions[0], TimeoutError)
+
+    def test_dead_process_is_a_failure(self):
+        with self.assertRaises(TaskGroupError) as cm:
+            with TaskGroup() as group:
+                group.create_task(os._exit, 3)
+        self.assertIsInstance(cm.exception.exceptions[0], ChildProcessError)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import asyncio
+import concurrent.futures
+import time
+from unittest import TestCase, main
+
+from parallel_utils.process import Monitor, create_process
+
+m = Monitor()
+
+
+class TestWeights(TestCase):
+
+    @staticmethod
+    def job(uid, weight, seconds):
+        with m.synchronized(uid, 4, weight=weight):
+            entered = time.time()
+            time.sleep(seconds)
+        return entered
+
+    @staticmethod
+    def light_jobs(uid, until):
+        while time.time() < until:
+            with m.synchronized(uid, 4):
+                time.sleep(0.01)
+
+    def test_permits_are_packed(self):
+        t1 = time.time_ns()
+        concurrent.futures.wait([create_process(self.job, 'test1', 2, 1) for _ in range(4)])
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 2)
+        self.assertLessEqual(delta, 2.5)
+
+    def test_heavy_requests_are_not_starved(self):
+        light1 = create_process(self.job, 'test2', 1, 1)
+        time.sleep(0.3)
+        heavy = create_process(self.job, 'test2', 4, 0.5)
+        time.sleep(0.3)
+        light2 = create_process(self.job, 'test2', 1, 0)
+        self.assertLess(light1.result(), heavy.result())
+        self.assertLess(heavy.result() + 0.5, light2.result())
+
+    def test_async(self):
+        async def job():
+            async with m.synchronized_async('test3', 4, weight=2):
+                await asyncio.sleep(1)
+
+        async def run():
+            await asyncio.gather(*(job() for _ in range(4)))
+
+        t1 = time.time_ns()
+        asyncio.run(run())
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 2)
+        self.assertLessEqual(delta, 2.5)
+
+    def test_heavy_coroutines_are_not_starved(self):
+        async def heavy():
+            await asyncio.sleep(0.5)
+            t1 = time.time()
+            async with m.synchronized_async('test4', 4, weight=4):
+                return time.time() - t1
+
+        processes = [create_process(self.light_jobs, 'test4', time.time() + 4) for _ in range(6)]
+        waited = asyncio.run(heavy())
+        concurrent.futures.wait(processes)
+        self.assertLess(waited, 1.5)
+
+    def test_weight_above_capacity(self):
+        with m.synchronized('test5', 4):
+            pass
+        with self.assertRaises(ValueError):
+            m.lock_code('test5', 16, weight=8)
+        with self.assertRaises(ValueError):
+            asyncio.run(asyncio.wait_for(m.acquire_async('test5', 16, weight=8), 5))
+        with m.synchronized('test5', 4, weight=4):
+            pass
+
+
+if __name__ == '__main__':
+    main()
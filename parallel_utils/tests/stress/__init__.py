@@ -0,0 +1,55 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import os
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple, Union
+
+# Multiplies the number of workers, uids and stages of every stress test. 0 skips them.
+SCALE = int(os.environ.get('PARALLEL_UTILS_STRESS', '1'))
+
+
+def scaled(n: int) -> int:
+    return n * SCALE
+
+
+def percentile(values: List[int], p: float) -> int:
+    '''
+    :param values: Sorted values.
+    :param p: The percentile, between 0 and 100.
+    '''
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else 0
+
+
+def report(name: str, seconds: float, latencies: List[int]):
+    '''
+    Prints the throughput of a stress test and the percentiles of the time its workers waited to lock, in nanoseconds.
+    Run pytest with '-s' to see it.
+    '''
+    latencies = sorted(latencies)
+    print(f'\n{name}: {len(latencies)} locks in {seconds:.2f} s, {len(latencies) / seconds:.0f} locks/s, '
+          f'wait p50 {percentile(latencies, 50) / 1000:.1f} us, p99 {percentile(latencies, 99) / 1000:.1f} us, '
+          f'max {percentile(latencies, 100) / 1000:.1f} us', file=sys.stderr)
+
+
+def max_permits(holds: Iterable[Tuple[Union[str, int], int, int, int]]) -> Dict[Union[str, int], int]:
+    '''
+    Sweeps the intervals during which workers held uids, timed with 'time.monotonic_ns()' right after locking and right
+    before unlocking, so the intervals of two workers can only overlap if both held the uid at the same time.
+    :param holds: (uid, weight, start, end) tuples.
+    :return: The maximum number of permits held at once for every uid.
+    '''
+    events = defaultdict(list)
+    for uid, weight, start, end in holds:
+        # At the same instant, releases are counted before acquisitions
+        events[uid] += [(start, 1, weight), (end, 0, -weight)]
+    peaks = {}
+    for uid, changes in events.items():
+        held = peak = 0
+        for _, _, weight in sorted(changes):
+            held += weight
+            peak = max(peak, held)
+        peaks[uid] = peak
+    return peaks
@@ -0,0 +1,145 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import concurrent.futures
+import random
+import time
+from unittest import TestCase, main, skipUnless
+
+from parallel_utils.process import Monitor, StaticMonitor, create_process, synchronized, synchronized_priority
+from parallel_utils.tests.stress import SCALE, max_permits, report, scaled
+
+m = Monitor()
+
+
+@synchronized(3)
+def hold():
+    start = time.monotonic_ns()
+    # Lets other processes run while the function is held
+    time.sleep(0)
+    return start, time.monotonic_ns()
+
+
+@skipUnless(SCALE, 'PARALLEL_UTILS_STRESS is 0')
+class TestProcessStress(TestCase):
+
+    @staticmethod
+    def limit(uid):
+        return 1 + uid % 4
+
+    @staticmethod
+    def lock_randomly(monitor, seed, uids, locks):
+        rand, holds, latencies = random.Random(seed), [], []
+        for _ in range(locks):
+            uid = rand.randrange(uids)
+            max_threads = TestProcessStress.limit(uid)
+            weight = rand.randint(1, max_threads)
+            t1 = time.monotonic_ns()
+            monitor.lock_code(uid, max_threads, weight)
+            start = time.monotonic_ns()
+            # Lets other processes run while the uid is held
+            time.sleep(0)
+            end = time.monotonic_ns()
+            monitor.unlock_code(uid, weight)
+            holds.append((uid, weight, start, end))
+            latencies.append(start - t1)
+        return holds, latencies
+
+    @staticmethod
+    def run_stages(monitor, uid, worker, workers, stages):
+        # Every worker runs its stages in increasing order, so every stage is eventually reached
+        entered, latencies = [], []
+        for order in range(worker + 1, stages + 1, workers):
+            t1 = time.monotonic_ns()
+            monitor.lock_priority_code(uid, order, stages)
+            start = time.monotonic_ns()
+            monitor.unlock_code(uid)
+            entered.append((start, uid, order))
+            latencies.append(start - t1)
+        return entered, latencies
+
+    @staticmethod
+    def call_repeatedly(calls):
+        holds, latencies = [], []
+        for _ in range(calls):
+            t1 = time.monotonic_ns()
+            start, end = hold()
+            holds.append(('synchronized', 1, start, end))
+            latencies.append(start - t1)
+        return holds, latencies
+
+    @staticmethod
+    def run_decorated_stages(worker, workers, stages):
+        entered = []
+        for order in range(worker + 1, stages + 1, workers):
+            @synchronized_priority('decorated stages', order, stages)
+            def enter():
+                entered.append((time.monotonic_ns(), order))
+
+            enter()
+        return entered
+
+    @staticmethod
+    def lock_every_permit(monitor, uids):
+        for uid in range(uids):
+            with monitor.synchronized(uid, TestProcessStress.limit(uid), TestProcessStress.limit(uid)):
+                pass
+
+    def wait(self, futures):
+        done, not_done = concurrent.futures.wait(futures, timeout=120 * SCALE)
+        self.assertEqual(0, len(not_done))
+        return [f.result() for f in futures]
+
+    def storm(self, name, *monitors):
+        # Workers take turns between the monitors, which share the same uids, so the limits are checked per monitor
+        uids, processes, locks = scaled(200), scaled(4), 50
+        t1 = time.monotonic()
+        results = self.wait([create_process(self.lock_randomly, monitors[i % len(monitors)], i, uids, locks)
+                             for i in range(processes)])
+        t2 = time.monotonic()
+        report(name, t2 - t1, [latency for _, process_latencies in results for latency in process_latencies])
+        self.assertEqual(processes * locks, sum(len(process_holds) for process_holds, _ in results))
+        for index, monitor in enumerate(monitors):
+            holds = [hold for process_holds, _ in results[index::len(monitors)] for hold in process_holds]
+            for uid, peak in max_permits(holds).items():
+                self.assertLessEqual(peak, self.limit(uid))
+            self.wait([create_process(self.lock_every_permit, monitor, uids)])
+
+    def test_monitor_limits(self):
+        self.storm('process Monitor', m)
+
+    def test_static_monitor_limits(self):
+        self.storm('process StaticMonitor', StaticMonitor)
+
+    def test_instances_limits(self):
+        self.storm('process Monitor instances', Monitor(), Monitor())
+
+    def test_priority_stages(self):
+        uids, workers, stages = scaled(2), 4, scaled(50)
+        t1 = time.monotonic()
+        results = self.wait([create_process(self.run_stages, m, f'stages{uid}', worker, workers, stages)
+                             for uid in range(uids) for worker in range(workers)])
+        t2 = time.monotonic()
+        report('process priority stages', t2 - t1, [latency for _, latencies in results for latency in latencies])
+        entered = sorted(entry for process_entered, _ in results for entry in process_entered)
+        for uid in range(uids):
+            self.assertEqual(list(range(1, stages + 1)), [order for _, u, order in entered if u == f'stages{uid}'])
+
+    def test_decorators(self):
+        processes, calls, workers, stages = scaled(4), 50, 4, scaled(50)
+        t1 = time.monotonic()
+        callers = [create_process(self.call_repeatedly, calls) for _ in range(processes)]
+        stagers = [create_process(self.run_decorated_stages, worker, workers, stages) for worker in range(workers)]
+        results, staged = self.wait(callers), self.wait(stagers)
+        t2 = time.monotonic()
+        report('process decorators', t2 - t1, [latency for _, latencies in results for latency in latencies])
+        holds = [hold for process_holds, _ in results for hold in process_holds]
+        self.assertEqual(processes * calls, len(holds))
+        self.assertLessEqual(max_permits(holds)['synchronized'], 3)
+        entered = sorted(entry for process_entered in staged for entry in process_entered)
+        self.assertEqual(list(range(1, stages + 1)), [order for _, order in entered])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import concurrent.futures
+import random
+import time
+from unittest import TestCase, main, skipUnless
+
+from parallel_utils.tests.stress import SCALE, max_permits, report, scaled
+from parallel_utils.thread import Monitor, StaticMonitor, create_thread, synchronized, synchronized_priority
+
+m = Monitor()
+
+
+@skipUnless(SCALE, 'PARALLEL_UTILS_STRESS is 0')
+class TestThreadStress(TestCase):
+
+    @staticmethod
+    def limit(uid):
+        return 1 + uid % 4
+
+    @classmethod
+    def lock_randomly(cls, monitor, seed, uids, locks, holds, latencies):
+        rand = random.Random(seed)
+        for _ in range(locks):
+            uid = rand.randrange(uids)
+            max_threads = cls.limit(uid)
+            weight = rand.randint(1, max_threads)
+            t1 = time.monotonic_ns()
+            monitor.lock_code(uid, max_threads, weight)
+            start = time.monotonic_ns()
+            # Lets other threads run while the uid is held
+            time.sleep(0)
+            end = time.monotonic_ns()
+            monitor.unlock_code(uid, weight)
+            holds.append((uid, weight, start, end))
+            latencies.append(start - t1)
+
+    @staticmethod
+    def run_stages(monitor, uid, worker, workers, stages, entered, latencies):
+        # Every worker runs its stages in increasing order, so every stage is eventually reached
+        for order in range(worker + 1, stages + 1, workers):
+            t1 = time.monotonic_ns()
+            monitor.lock_priority_code(uid, order, stages)
+            latencies.append(time.monotonic_ns() - t1)
+            entered[uid].append(order)
+            monitor.unlock_code(uid)
+
+    def check_no_permits_leaked(self, monitor, uids):
+        def lock_every_permit():
+            for uid in range(uids):
+                with monitor.synchronized(uid, self.limit(uid), self.limit(uid)):
+                    pass
+
+        create_thread(lock_every_permit).result(timeout=10)
+
+    def storm(self, name, *monitors):
+        # Workers take turns between the monitors, which share the same uids, so the limits are checked per monitor
+        uids, threads, locks = scaled(1000), scaled(100), 100
+        holds, latencies = [[] for _ in monitors], []
+        t1 = time.monotonic()
+        futures = [create_thread(self.lock_randomly, monitors[i % len(monitors)], i, uids, locks,
+                                 holds[i % len(monitors)], latencies) for i in range(threads)]
+        done, not_done = concurrent.futures.wait(futures, timeout=60 * SCALE)
+        t2 = time.monotonic()
+        self.assertEqual(0, len(not_done))
+        [f.result() for f in done]
+        report(name, t2 - t1, latencies)
+        self.assertEqual(threads * locks, sum(len(monitor_holds) for monitor_holds in holds))
+        for monitor, monitor_holds in zip(monitors, holds):
+            for uid, peak in max_permits(monitor_holds).items():
+                self.assertLessEqual(peak, self.limit(uid))
+            self.check_no_permits_leaked(monitor, uids)
+
+    def test_monitor_limits(self):
+        self.storm('thread Monitor', m)
+
+    def test_static_monitor_limits(self):
+        self.storm('thread StaticMonitor', StaticMonitor)
+
+    def test_instances_limits(self):
+        self.storm('thread Monitor instances', Monitor(), Monitor())
+
+    def test_priority_stages(self):
+        uids, workers, stages = scaled(10), 8, scaled(100)
+        entered, latencies = {f'stages{uid}': [] for uid in range(uids)}, []
+        t1 = time.monotonic()
+        futures = [create_thread(self.run_stages, m, f'stages{uid}', worker, workers, stages, entered, latencies)
+                   for uid in range(uids) for worker in range(workers)]
+        done, not_done = concurrent.futures.wait(futures, timeout=60 * SCALE)
+        t2 = time.monotonic()
+        self.assertEqual(0, len(not_done))
+        [f.result() for f in done]
+        report('thread priority stages', t2 - t1, latencies)
+        for orders in entered.values():
+            self.assertEqual(list(range(1, stages + 1)), orders)
+
+    def test_decorators(self):
+        threads, calls, workers, stages = scaled(100), 100, 8, scaled(100)
+        holds, latencies, entered = [], [], []
+
+        @synchronized(3)
+        def hold(t1):
+            start = time.monotonic_ns()
+            time.sleep(0)
+            holds.append(('synchronized', 1, start, time.monotonic_ns()))
+            latencies.append(start - t1)
+
+        def call_repeatedly():
+            for _ in range(calls):
+                hold(time.monotonic_ns())
+
+        def stage(order):
+            @synchronized_priority('decorated stages', order, stages)
+            def enter():
+                entered.append(order)
+
+            return enter
+
+        steps = [stage(order) for order in range(1, stages + 1)]
+
+        def run_stages(worker):
+            for order in range(worker + 1, stages + 1, workers):
+                steps[order - 1]()
+
+        t1 = time.monotonic()
+        futures = [create_thread(call_repeatedly) for _ in range(threads)]
+        futures += [create_thread(run_stages, worker) for worker in range(workers)]
+        done, not_done = concurrent.futures.wait(futures, timeout=60 * SCALE)
+        t2 = time.monotonic()
+        self.assertEqual(0, len(not_done))
+        [f.result() for f in done]
+        report('thread decorators', t2 - t1, latencies)
+        self.assertEqual(threads * calls, len(holds))
+        self.assertLessEqual(max_permits(holds)['synchronized'], 3)
+        self.assertEqual(list(range(1, stages + 1)), entered)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import asyncio
+import time
+from unittest import TestCase, main
+
+from parallel_utils.thread import Monitor, create_thread, create_thread_async
+
+m = Monitor()
+
+
+class TestAsync(TestCase):
+
+    @staticmethod
+    async def one_second(uid):
+        async with m.synchronized_async(uid):
+            await asyncio.sleep(1)
+
+    @staticmethod
+    def one_second_thread(uid):
+        with m.synchronized(uid):
+            time.sleep(1)
+
+    def test_three_seconds_three_coroutines(self):
+        async def run():
+            await asyncio.gather(*(self.one_second('test1') for _ in range(3)))
+
+        t1 = time.time_ns()
+        asyncio.run(run())
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 3)
+        self.assertLessEqual(delta, 3.5)
+
+    def test_waits_for_threads_without_blocking_the_loop(self):
+        ticks = []
+
+        async def tick():
+            for _ in range(10):
+                ticks.append(time.time())
+                await asyncio.sleep(0.1)
+
+        async def run():
+            thread = create_thread(self.one_second_thread, 'test2')
+            await asyncio.sleep(0.1)
+            await asyncio.gather(self.one_second('test2'), tick())
+            thread.result()
+
+        t1 = time.time_ns()
+        asyncio.run(run())
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 2)
+        self.assertLessEqual(delta, 2.5)
+        self.assertEqual(10, len(ticks))
+
+    def test_cancelled_waiter(self):
+        async def run():
+            m.lock_code('test3')
+            task = asyncio.ensure_future(m.acquire_async('test3'))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            m.unlock_code('test3')
+            await asyncio.wait_for(m.acquire_async('test3'), 1)
+            m.unlock_code('test3')
+
+        asyncio.run(run())
+
+    def test_unlock_after_the_loop_is_closed(self):
+        asyncio.run(m.acquire_async('test4'))
+        m.unlock_code('test4')
+        m.lock_code('test4')
+        loop = asyncio.new_event_loop()
+        loop.create_task(m.acquire_async('test4'))
+        loop.run_until_complete(asyncio.sleep(0.1))
+        loop.close()
+        m.unlock_code('test4')
+        asyncio.run(asyncio.wait_for(m.acquire_async('test4'), 1))
+        m.unlock_code('test4')
+
+    def test_create_thread_async(self):
+        async def run():
+            return await asyncio.gather(create_thread_async(pow, 2, 10), create_thread_async(pow, 3, 2))
+
+        self.assertEqual([1024, 9], asyncio.run(run()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import time
+from queue import Empty, Full
+from unittest import TestCase, main
+
+from parallel_utils.thread import Channel, ChannelClosed, create_thread
+
+
+class TestChannel(TestCase):
+
+    @staticmethod
+    def produce(channel, n):
+        with channel:
+            for i in range(n):
+                channel.put(i)
+
+    @staticmethod
+    def slow_consume(channel):
+        results = []
+        for item in channel:
+            time.sleep(0.01)
+            results.append(item)
+        return results
+
+    def test_producer_consumer(self):
+        channel = Channel(maxsize=4)
+        consumer = create_thread(self.slow_consume, channel)
+        self.produce(channel, 100)
+        self.assertEqual(list(range(100)), consumer.result())
+
+    def test_timeouts(self):
+        channel = Channel(maxsize=2)
+        self.assertRaises(Empty, channel.get, timeout=0.1)
+        self.assertEqual(2, channel.put_many(range(5), timeout=0.1))
+        self.assertRaises(Full, channel.put, 'x', timeout=0)
+        self.assertEqual([0, 1], channel.get_many(10, timeout=0))
+
+    def test_batches_and_close(self):
+        channel = Channel(maxsize=3)
+        consumer = create_thread(channel.get_many, 10)
+        t1 = time.time_ns()
+        time.sleep(0.5)
+        self.assertEqual(5, channel.put_many(range(5)))
+        t2 = time.time_ns()
+        self.assertGreaterEqual((t2 - t1) * (10 ** -9), 0.5)
+        self.assertIn(len(consumer.result()), (1, 2, 3))
+        channel.close()
+        self.assertRaises(ChannelClosed, channel.put, 'x')
+        self.assertGreater(len(channel.get_many(10)), 0)
+        self.assertRaises(ChannelClosed, channel.get)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import concurrent.futures
+import threading
+import time
+from unittest import TestCase, main
+
+from parallel_utils.common import DeadlockDetector
+from parallel_utils.thread import Monitor, create_thread
+
+m = Monitor()
+reports = []
+m.enable_deadlock_detection(timeout=1, on_deadlock=reports.append)
+
+
+class TestDeadlock(TestCase):
+
+    @staticmethod
+    def f1():
+        time.sleep(2)
+        with m.synchronized_priority('test', 1, 2):
+            pass
+
+    @staticmethod
+    def f2():
+        with m.synchronized_priority('test', 2, 2):
+            pass
+
+    @staticmethod
+    def f3():
+        with m.synchronized_priority('test', 1, 3):
+            pass
+
+    def test_stalled_priority_chain(self):
+        threads = [create_thread(self.f2), create_thread(self.f1)]
+        concurrent.futures.wait(threads)
+        self.assertEqual(1, len(reports))
+        self.assertIn('stalled priority chain', reports[0])
+        self.assertIn("waits for uid 'test' (order 2)", reports[0])
+        create_thread(self.f3).result()
+        self.assertEqual(2, len(reports))
+        self.assertIn('set up with total 2', reports[1])
+
+    def test_cycle(self):
+        detector = DeadlockDetector(timeout=0)
+        detector.holding.update({'1:1': [('a', 1, 't1')], '1:2': [('b', 1, 't2')]})
+        detector.waiting.update({'1:1': ('b', 1, 0, 't1'), '1:2': ('a', 1, 0, 't2')})
+        report = []
+        detector.on_deadlock = report.append
+        detector.check()
+        self.assertIn('cycle: t1 -> t2 -> t1', report[0])
+        self.assertIn("t1 (1:1) waits for uid 'b' (order 1)", report[0])
+        self.assertIsNone(detector.check())
+
+    def test_disabling_stops_the_watchdog(self):
+        monitor = Monitor()
+        monitor.enable_deadlock_detection(timeout=0.2)
+        with monitor.synchronized('test'):
+            pass
+        watchdogs = [t for t in threading.enumerate() if t.name == 'DeadlockDetector']
+        monitor.disable_deadlock_detection()
+        time.sleep(0.3)
+        self.assertEqual(len(watchdogs) - 1, len([t for t in threading.enumerate() if t.name == 'DeadlockDetector']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import concurrent.futures
+import gc
+import threading
+import time
+from unittest import TestCase, main
+from weakref import ref
+
+from parallel_utils.thread import Monitor, create_thread, synchronized
+from parallel_utils.thread.monitor import CACHED_SECTIONS
+
+
+class TestFastPath(TestCase):
+
+    def test_sections_are_reused(self):
+        m = Monitor()
+        self.assertIs(m.synchronized('uid'), m.synchronized('uid'))
+        self.assertIsNot(m.synchronized('uid'), m.synchronized('uid', 2))
+
+    def test_only_recent_sections_are_kept(self):
+        m = Monitor()
+        hot, cold = m.synchronized('hot'), m.synchronized('cold')
+        for uid in range(CACHED_SECTIONS * 2):
+            m.synchronized(uid)
+            self.assertIs(hot, m.synchronized('hot'))
+        self.assertIsNot(cold, m.synchronized('cold'))
+
+    def test_mutual_exclusion(self):
+        m = Monitor()
+        counter = [0]
+
+        def increment():
+            for _ in range(10000):
+                with m.synchronized('counter'):
+                    value = counter[0]
+                    time.sleep(0)
+                    counter[0] = value + 1
+
+        concurrent.futures.wait([create_thread(increment) for _ in range(4)])
+        self.assertEqual(40000, counter[0])
+
+    def test_max_threads(self):
+        m = Monitor()
+
+        def one_second():
+            with m.synchronized('uid', 2):
+                time.sleep(1)
+
+        t1 = time.time_ns()
+        concurrent.futures.wait([create_thread(one_second) for _ in range(4)])
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 2)
+        self.assertLessEqual(delta, 2.5)
+
+    def test_cached_sections_dont_keep_the_monitor_alive(self):
+        fast, hooked = Monitor(), Monitor()
+        hooked.enable_spinning()
+        for m in fast, hooked:
+            with m.synchronized('uid'):
+                pass
+        monitors = [ref(fast), ref(hooked)]
+        del fast, hooked, m
+        gc.collect()
+        self.assertEqual([None, None], [monitor() for monitor in monitors])
+
+    def test_hooks_apply_to_cached_sections(self):
+        m = Monitor()
+        with m.synchronized('uid'):
+            pass
+        profiler = m.enable_profiling()
+        with m.synchronized('uid'):
+            pass
+        self.assertEqual(['wait', 'hold'], [e['cat'] for e in profiler.export()['traceEvents'] if e['ph'] == 'X'])
+
+    def test_overhead_is_close_to_a_lock(self):
+        m = Monitor()
+        lock = threading.Lock()
+
+        @synchronized()
+        def decorated():
+            pass
+
+        def timed(func):
+            t1 = time.perf_counter()
+            for _ in range(10000):
+                func()
+            return time.perf_counter() - t1
+
+        def with_lock():
+            with lock:
+                pass
+
+        def with_monitor():
+            with m.synchronized('uid'):
+                pass
+
+        reference = timed(with_lock)
+        self.assertLessEqual(timed(with_monitor), reference * 10)
+        self.assertLessEqual(timed(decorated), reference * 5)
+
+
+if __name__ == '__main__':
+    main()
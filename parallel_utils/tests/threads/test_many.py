@@ -0,0 +1,49 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import concurrent.futures
+import time
+from unittest import TestCase, main
+
+from parallel_utils.thread import Monitor, create_thread
+
+m = Monitor()
+
+
+class TestMany(TestCase):
+
+    @staticmethod
+    def lock_in_order(uids):
+        for _ in range(200):
+            with m.synchronized_many(uids):
+                time.sleep(0)
+
+    @staticmethod
+    def one_second(uids):
+        with m.synchronized_many(uids):
+            time.sleep(1)
+
+    def test_opposite_orders_do_not_deadlock(self):
+        threads = [create_thread(self.lock_in_order, ['a', 'b', 1]), create_thread(self.lock_in_order, [1, 'b', 'a'])]
+        done, not_done = concurrent.futures.wait(threads, timeout=10)
+        self.assertEqual(0, len(not_done))
+        for t in done:
+            self.assertIsNone(t.exception())
+
+    def test_overlapping_sets_are_exclusive(self):
+        t1 = time.time_ns()
+        threads = [create_thread(self.one_second, ['x', 'y']), create_thread(self.one_second, ['y', 'z']),
+                   create_thread(self.one_second, ['z'])]
+        concurrent.futures.wait(threads)
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 2)
+        self.assertLessEqual(delta, 2.5)
+
+    def test_canonical_order(self):
+        self.assertEqual([1, 2, 'a', 'b'], m.canonical_order(['b', 2, 'a', 1, 'b']))
+
+
+if __name__ == '__main__':
+    main()
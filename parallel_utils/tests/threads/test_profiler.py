@@ -0,0 +1,68 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import concurrent.futures
+import json
+import os
+import tempfile
+import time
+from unittest import TestCase, main
+
+from parallel_utils.thread import Monitor, create_thread
+
+
+class TestProfiler(TestCase):
+
+    def test_wait_and_hold_spans(self):
+        m = Monitor()
+        profiler = m.enable_profiling()
+
+        def hold():
+            with m.synchronized('uid'):
+                time.sleep(0.5)
+
+        concurrent.futures.wait([create_thread(hold) for _ in range(2)])
+        events = [e for e in profiler.export()['traceEvents'] if e['ph'] == 'X']
+        holds = [e for e in events if e['cat'] == 'hold']
+        waits = [e for e in events if e['cat'] == 'wait']
+        self.assertEqual(2, len(holds))
+        self.assertEqual(2, len(waits))
+        self.assertTrue(all(e['dur'] >= 500000 for e in holds))
+        # The second thread waited for the whole critical section of the first one
+        self.assertGreaterEqual(max(e['dur'] for e in waits), 400000)
+        self.assertTrue(all(e['args'] == {'uid': 'uid', 'order': 1} for e in events))
+
+    def test_ring_buffer(self):
+        m = Monitor()
+        profiler = m.enable_profiling(capacity=10)
+        for i in range(100):
+            with m.synchronized(i):
+                pass
+        events = [e for e in profiler.export()['traceEvents'] if e['ph'] == 'X']
+        self.assertEqual(10, len(events))
+        self.assertEqual(99, events[-1]['args']['uid'])
+
+    def test_disabled(self):
+        m = Monitor()
+        profiler = m.enable_profiling()
+        m.disable_profiling()
+        with m.synchronized('uid'):
+            pass
+        self.assertEqual([], [e for e in profiler.export()['traceEvents'] if e['ph'] == 'X'])
+
+    def test_export_to_file(self):
+        m = Monitor()
+        profiler = m.enable_profiling()
+        with m.synchronized_priority('uid', order=1, total=1):
+            pass
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'trace.json')
+            profiler.export(path)
+            with open(path) as f:
+                trace = json.load(f)
+        self.assertEqual(['wait', 'hold'], [e['cat'] for e in trace['traceEvents'] if e['ph'] == 'X'])
+
+
+if __name__ == '__main__':
+    main()
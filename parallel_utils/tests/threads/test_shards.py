@@ -0,0 +1,59 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import concurrent.futures
+import time
+from collections import Counter
+from unittest import TestCase, main
+
+from parallel_utils.common import shard_of
+from parallel_utils.thread import Monitor, create_thread
+
+m = Monitor(shards=8)
+
+
+class TestShards(TestCase):
+
+    def test_uids_are_spread_across_shards(self):
+        counts = Counter(shard_of(f'uid-{i}', 8) for i in range(8000))
+        self.assertEqual(8, len(counts))
+        self.assertGreater(min(counts.values()), 800)
+        self.assertEqual([i % 8 for i in range(16)], [shard_of(i, 8) for i in range(16)])
+
+    @staticmethod
+    def one_second(uid):
+        with m.synchronized(uid):
+            time.sleep(1)
+
+    def test_same_uid_is_exclusive(self):
+        t1 = time.time_ns()
+        concurrent.futures.wait([create_thread(self.one_second, 'shared') for _ in range(2)])
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 2)
+        self.assertLessEqual(delta, 2.5)
+
+    def test_many_uids_run_in_parallel(self):
+        t1 = time.time_ns()
+        concurrent.futures.wait([create_thread(self.one_second, i) for i in range(32)])
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 1)
+        self.assertLessEqual(delta, 1.5)
+
+    @staticmethod
+    def step(steps, order):
+        m.lock_priority_code('steps', order=order, total=3)
+        steps.append(order)
+        m.unlock_code('steps')
+
+    def test_priority_across_shards(self):
+        steps = []
+        threads = [create_thread(self.step, steps, order) for order in (3, 2, 1)]
+        concurrent.futures.wait(threads)
+        self.assertEqual([1, 2, 3], steps)
+
+
+if __name__ == '__main__':
+    main()
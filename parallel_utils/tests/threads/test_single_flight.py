@@ -0,0 +1,67 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import concurrent.futures
+import time
+from unittest import TestCase, main
+
+from parallel_utils.thread import create_thread, single_flight
+
+calls = []
+
+
+class TestSingleFlight(TestCase):
+
+    @staticmethod
+    @single_flight()
+    def one_second_computation(n):
+        calls.append(n)
+        time.sleep(1)
+        return n * 2
+
+    @staticmethod
+    @single_flight()
+    def failing_computation():
+        time.sleep(1)
+        raise ValueError('failed')
+
+    @staticmethod
+    @single_flight(ttl=1, maxsize=1)
+    def cached_computation(n):
+        calls.append(n)
+        return n * 2
+
+    def test_concurrent_calls_share_one_execution(self):
+        calls.clear()
+        t1 = time.time_ns()
+        threads = [create_thread(self.one_second_computation, i % 2) for i in range(6)]
+        concurrent.futures.wait(threads)
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 1)
+        self.assertLessEqual(delta, 1.5)
+        self.assertEqual([0, 2, 0, 2, 0, 2], [t.result() for t in threads])
+        self.assertEqual([0, 1], sorted(calls))
+
+    def test_exception_is_shared(self):
+        threads = [create_thread(self.failing_computation) for _ in range(3)]
+        concurrent.futures.wait(threads)
+        for t in threads:
+            self.assertIsInstance(t.exception(), ValueError)
+
+    def test_ttl_and_eviction(self):
+        calls.clear()
+        self.assertEqual(2, self.cached_computation(1))
+        self.assertEqual(2, self.cached_computation(1))
+        self.assertEqual([1], calls)
+        self.cached_computation(2)
+        self.cached_computation(1)
+        self.assertEqual([1, 2, 1], calls)
+        time.sleep(1)
+        self.cached_computation(1)
+        self.assertEqual([1, 2, 1, 1], calls)
+
+
+if __name__ == '__main__':
+    main()
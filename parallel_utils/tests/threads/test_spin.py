@@ -0,0 +1,70 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import concurrent.futures
+import time
+from threading import Semaphore
+from unittest import TestCase, main
+
+from parallel_utils.common import AdaptiveSpin
+from parallel_utils.thread import Monitor, create_thread
+
+m = Monitor()
+m.enable_spinning()
+counter = [0]
+
+
+class TestSpin(TestCase):
+
+    @staticmethod
+    def increment():
+        for _ in range(1000):
+            with m.synchronized('counter'):
+                value = counter[0]
+                time.sleep(0)
+                counter[0] = value + 1
+
+    @staticmethod
+    def one_second():
+        with m.synchronized('slow'):
+            time.sleep(1)
+
+    def test_mutual_exclusion(self):
+        threads = [create_thread(self.increment) for _ in range(8)]
+        concurrent.futures.wait(threads)
+        self.assertEqual(8000, counter[0])
+
+    def test_three_seconds_three_threads(self):
+        t1 = time.time_ns()
+        concurrent.futures.wait([create_thread(self.one_second) for _ in range(3)])
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 3)
+        self.assertLessEqual(delta, 3.5)
+
+    def test_budget_adapts_to_hold_time(self):
+        spinner = AdaptiveSpin(max_spins=8, max_hold=0.01)
+        s = Semaphore(1)
+        for _ in range(3):
+            spinner.acquire('uid', s.acquire)
+            time.sleep(0.02)
+            s.release()
+            spinner.released('uid')
+        self.assertEqual(1, spinner.budgets['uid'])
+        for _ in range(10):
+            spinner.acquire('uid', s.acquire)
+            s.release()
+            spinner.released('uid')
+        self.assertEqual(8, spinner.budgets['uid'])
+
+    def test_slow_tries_are_capped(self):
+        self.assertEqual(1, AdaptiveSpin(max_spins=100, max_hold=0.0001, try_cost=0.00008).max_spins)
+        spinner = AdaptiveSpin(max_spins=100, max_hold=0.0001, try_cost=0.001)
+        calls = []
+        spinner.acquire('uid', lambda blocking: calls.append(blocking) or True)
+        self.assertEqual([True], calls)
+
+
+if __name__ == '__main__':
+    main()
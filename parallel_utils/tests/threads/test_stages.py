@@ -0,0 +1,40 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import concurrent.futures
+import time
+from unittest import TestCase, main
+
+from parallel_utils.common import UidState
+from parallel_utils.thread import Monitor, create_thread
+
+m = Monitor()
+results = []
+
+
+class TestStages(TestCase):
+
+    @staticmethod
+    def stage(order, total=None):
+        with m.synchronized_priority('stages', order, total):
+            results.append(order)
+
+    def test_many_stages_in_order(self):
+        threads = [create_thread(self.stage, order) for order in range(200, 1, -1)]
+        time.sleep(0.1)
+        threads.append(create_thread(self.stage, 1, 200))
+        concurrent.futures.wait(threads)
+        self.assertEqual(list(range(1, 201)), results)
+
+    def test_state_size_does_not_depend_on_total(self):
+        t1 = time.time_ns()
+        with m.synchronized_priority('huge', 1, 10 ** 7):
+            pass
+        t2 = time.time_ns()
+        self.assertLessEqual((t2 - t1) * (10 ** -9), 0.1)
+        self.assertFalse(hasattr(UidState(10 ** 7, 1), '__dict__'))
+
+
+if __name__ == '__main__':
+    main()
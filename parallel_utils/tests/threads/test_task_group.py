@@ -0,0 +1,87 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import time
+from unittest import TestCase, main
+
+from parallel_utils.thread import TaskGroup, TaskGroupError
+
+
+def square(x):
+    return x * x
+
+
+def fail(message):
+    time.sleep(0.2)
+    raise ValueError(message)
+
+
+def work(group, seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if group.cancelled.wait(0.01):
+            return 'cancelled'
+    return 'finished'
+
+
+class TestTaskGroup(TestCase):
+
+    def test_results(self):
+        with TaskGroup() as group:
+            futures = [group.create_task(square, i) for i in range(5)]
+        self.assertEqual([0, 1, 4, 9, 16], [f.result() for f in futures])
+
+    def test_failure_cancels_siblings(self):
+        t1 = time.time_ns()
+        with self.assertRaises(TaskGroupError) as cm:
+            with TaskGroup() as group:
+                sibling = group.create_task(work, group, 10)
+                group.create_task(fail, 'boom')
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertLessEqual(delta, 1)
+        self.assertEqual('cancelled', sibling.result())
+        self.assertEqual(1, len(cm.exception.exceptions))
+        self.assertIsInstance(cm.exception.exceptions[0], ValueError)
+
+    def test_exceptions_are_aggregated(self):
+        with self.assertRaises(TaskGroupError) as cm:
+            with TaskGroup() as group:
+                group.create_task(fail, 'a')
+                group.create_task(fail, 'b')
+        self.assertEqual({'a', 'b'}, {str(e) for e in cm.exception.exceptions})
+
+    def test_deadline(self):
+        t1 = time.time_ns()
+        with self.assertRaises(TaskGroupError) as cm:
+            with TaskGroup(timeout=0.5) as group:
+                group.create_task(work, group, 10)
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 0.5)
+        self.assertLessEqual(delta, 1)
+        self.assertIsInstance(cm.exception.exceptions[-1], TimeoutError)
+
+    def test_deadline_does_not_wait_for_blocked_tasks(self):
+        t1 = time.time_ns()
+        with self.assertRaises(TaskGroupError) as cm:
+            with TaskGroup(timeout=0.5) as group:
+                task = group.create_task(time.sleep, 3)
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertLessEqual(delta, 1)
+        self.assertFalse(task.done())
+        self.assertEqual(1, len(cm.exception.exceptions))
+        self.assertIsInstance(cm.exception.exceptions[0], TimeoutError)
+
+    def test_body_exception_cancels_tasks(self):
+        with self.assertRaises(KeyError):
+            with TaskGroup() as group:
+                task = group.create_task(work, group, 10)
+                raise KeyError('body')
+        self.assertEqual('cancelled', task.result())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+import asyncio
+import concurrent.futures
+import time
+from unittest import TestCase, main
+
+from parallel_utils.thread import Monitor, create_thread
+
+m = Monitor()
+
+
+class TestWeights(TestCase):
+
+    @staticmethod
+    def job(uid, weight, seconds, entries=None, name=None):
+        with m.synchronized(uid, 4, weight=weight):
+            if entries is not None:
+                entries.append(name)
+            time.sleep(seconds)
+
+    def test_permits_are_packed(self):
+        t1 = time.time_ns()
+        concurrent.futures.wait([create_thread(self.job, 'test1', 2, 1) for _ in range(4)])
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 2)
+        self.assertLessEqual(delta, 2.5)
+
+    def test_heavy_requests_are_not_starved(self):
+        entries = []
+        threads = [create_thread(self.job, 'test2', 1, 1, entries, 'light1')]
+        time.sleep(0.1)
+        threads.append(create_thread(self.job, 'test2', 4, 0.5, entries, 'heavy'))
+        time.sleep(0.1)
+        threads.append(create_thread(self.job, 'test2', 1, 0, entries, 'light2'))
+        concurrent.futures.wait(threads)
+        self.assertEqual(['light1', 'heavy', 'light2'], entries)
+
+    def test_lock_code(self):
+        m.lock_code('test3', 3, weight=3)
+        thread = create_thread(self.job, 'test3', 1, 0)
+        time.sleep(0.5)
+        self.assertFalse(thread.done())
+        m.unlock_code('test3', weight=3)
+        thread.result(timeout=1)
+
+    def test_async(self):
+        async def job():
+            async with m.synchronized_async('test4', 4, weight=2):
+                await asyncio.sleep(1)
+
+        async def run():
+            await asyncio.gather(*(job() for _ in range(4)))
+
+        t1 = time.time_ns()
+        asyncio.run(run())
+        t2 = time.time_ns()
+        delta = (t2 - t1) * (10 ** -9)
+        self.assertGreaterEqual(delta, 2)
+        self.assertLessEqual(delta, 2.5)
+
+    def test_heavy_coroutines_are_not_starved(self):
+        until = time.time() + 3
+
+        def light():
+            while time.time() < until:
+                with m.synchronized('test5', 4):
+                    time.sleep(0.01)
+
+        async def heavy():
+            await asyncio.sleep(0.1)
+            t1 = time.time()
+            async with m.synchronized_async('test5', 4, weight=4):
+                return time.time() - t1
+
+        threads = [create_thread(light) for _ in range(6)]
+        waited = asyncio.run(heavy())
+        concurrent.futures.wait(threads)
+        self.assertLess(waited, 1)
+
+    def test_weight_above_capacity(self):
+        with m.synchronized('test6', 4):
+            pass
+        with self.assertRaises(ValueError):
+            m.lock_code('test6', 16, weight=8)
+        with m.synchronized('test7'):
+            pass
+        with self.assertRaises(ValueError):
+            m.lock_code('test7', 4, weight=3)
+        with self.assertRaises(ValueError):
+            m.synchronized('test7', 4, weight=3)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,5 +3,8 @@
 
 
 from parallel_utils.thread.monitor import Monitor, StaticMonitor
-from parallel_utils.thread.decorators import synchronized, synchronized_priority
-from parallel_utils.thread.utils import create_thread
+from parallel_utils.thread.decorators import single_flight, synchronized, synchronized_priority
+from parallel_utils.thread.utils import create_thread, create_thread_async
+from parallel_utils.thread.channel import Channel, ChannelClosed
+from parallel_utils.thread.task_group import TaskGroup
+from parallel_utils.common import TaskGroupError
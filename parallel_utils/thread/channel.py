@@ -0,0 +1,75 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+from collections import deque
+from threading import Condition, Lock
+from time import monotonic
+from typing import Any, Iterable, List
+
+from parallel_utils.common import AbstractChannel, ChannelClosed
+
+
+class Channel(AbstractChannel):
+    '''
+    A bounded channel to pass items between threads. Both the items and the throttling live behind a single lock, so
+    it replaces the pair of a 'queue.Queue' and a 'lock_code' call.
+    '''
+
+    def __init__(self, maxsize: int = 1):
+        '''
+        :param maxsize: Maximum number of items the channel can hold.
+        '''
+        assert maxsize > 0
+        self.maxsize = maxsize
+        self.items = deque()
+        self.closed = False
+        self.lock = Lock()
+        self.not_empty = Condition(self.lock)
+        self.not_full = Condition(self.lock)
+
+    def put_many(self, items: Iterable[Any], timeout: float = None) -> int:
+        items = list(items)
+        deadline = None if timeout is None else monotonic() + timeout
+        put = 0
+        with self.lock:
+            while put < len(items):
+                if self.closed:
+                    if put == 0:
+                        raise ChannelClosed
+                    break
+                room = self.maxsize - len(self.items)
+                if room == 0:
+                    remaining = None if deadline is None else deadline - monotonic()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self.not_full.wait(remaining)
+                    continue
+                self.items.extend(items[put:put + room])
+                put += min(room, len(items) - put)
+                self.not_empty.notify_all()
+        return put
+
+    def get_many(self, max_items: int, timeout: float = None) -> List[Any]:
+        assert max_items > 0
+        deadline = None if timeout is None else monotonic() + timeout
+        with self.lock:
+            while not self.items:
+                if self.closed:
+                    raise ChannelClosed
+                remaining = None if deadline is None else deadline - monotonic()
+                if remaining is not None and remaining <= 0:
+                    return []
+                self.not_empty.wait(remaining)
+            items = [self.items.popleft() for _ in range(min(max_items, len(self.items)))]
+            self.not_full.notify_all()
+        return items
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.not_empty.notify_all()
+            self.not_full.notify_all()
+
+    def __len__(self):
+        return len(self.items)
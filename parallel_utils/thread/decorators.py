@@ -2,9 +2,11 @@
 # encoding:utf-8
 
 
+from collections import OrderedDict
 from functools import wraps
-from threading import Semaphore
-from typing import Union
+from threading import Event, Lock, Semaphore
+from time import monotonic
+from typing import Any, Callable, Hashable, Union
 
 from parallel_utils.thread import Monitor
 
@@ -15,7 +17,8 @@ def synchronized(max_threads: int = 1):
     :param max_threads: Maximum number of threads.
     """
 
-    s = Semaphore(max_threads)
+    # A bare lock is much cheaper than a semaphore, which is written in Python
+    s = Lock() if max_threads == 1 else Semaphore(max_threads)
 
     def locked(func):
         @wraps(func)
@@ -28,6 +31,68 @@ def synchronized(max_threads: int = 1):
     return locked
 
 
+def default_key(*args: Any, **kwargs: Any) -> Hashable:
+    return args, tuple(sorted(kwargs.items()))
+
+
+def single_flight(key: Callable[..., Hashable] = None, ttl: float = None, maxsize: int = 128):
+    """
+    This decorator will collapse concurrent calls to this function with the same key into a single execution,
+    whose result or exception is shared by all of them, instead of making them run one after another.
+    :param key: A function called with the same arguments that returns the key of the call. By default, the key is
+    built from the arguments themselves, so they must be hashable.
+    :param ttl: Number of seconds the result of a call is cached after it finishes. None by default, so results are
+    only shared with the calls made while it was running.
+    :param maxsize: Maximum number of cached results. The least recently used ones are evicted first.
+    """
+
+    key = key or default_key
+    lock = Lock()
+    # flights = {key: [event, succeeded, value]} for every running call
+    flights = {}
+    # cache = {key: (expiration, value)}, in least recently used order
+    cache = OrderedDict()
+
+    def locked(func):
+        @wraps(func)
+        def locked_func(*args, **kwargs):
+            k = key(*args, **kwargs)
+            with lock:
+                cached = cache.get(k)
+                if cached is not None and cached[0] > monotonic():
+                    cache.move_to_end(k)
+                    return cached[1]
+                flight = flights.get(k)
+                leader = flight is None
+                if leader:
+                    flight = flights[k] = [Event(), False, None]
+            if not leader:
+                flight[0].wait()
+                if flight[1]:
+                    return flight[2]
+                raise flight[2]
+            try:
+                flight[2] = func(*args, **kwargs)
+                flight[1] = True
+                return flight[2]
+            except BaseException as e:
+                flight[2] = e
+                raise
+            finally:
+                with lock:
+                    del flights[k]
+                    if flight[1] and ttl is not None:
+                        cache[k] = (monotonic() + ttl, flight[2])
+                        cache.move_to_end(k)
+                        while len(cache) > maxsize:
+                            cache.popitem(last=False)
+                flight[0].set()
+
+        return locked_func
+
+    return locked
+
+
 def synchronized_priority(uid: Union[str, int], order: int = 1, total: int = None):
     m = Monitor()
 
@@ -2,64 +2,179 @@
 # encoding:utf-8
 
 
-from threading import Semaphore
-from typing import Union
+import asyncio
+from collections import OrderedDict, namedtuple
+from functools import partial
+from threading import Lock
+from time import time_ns
+from typing import Any, Callable, Union
+from weakref import ref
 
 from private_attrs import PrivateAttrs
 
-from parallel_utils.common import AbstractMonitor
+from parallel_utils.common import (AbstractMonitor, AdaptiveSpin, DeadlockDetector, Profiler, ShardedUidStates,
+                                   UidState, UidStates)
+
+# The optional hooks of a monitor, which are all None when none of them is enabled
+Hooks = namedtuple('Hooks', ('detector', 'spinner', 'profiler'))
+NO_HOOKS = Hooks(None, None, None)
+
+# Number of sections made by 'synchronized' that every monitor keeps for reuse. The least recently used ones are
+# dropped beyond it, so that a monitor that goes through many uids doesn't keep a section for each of them
+CACHED_SECTIONS = 256
 
 
 def Monitor():
     p = PrivateAttrs()
-    locker = Semaphore(1)
 
-    def lock_priority_code(self, uid: Union[str, int], order: int, total: int, max_threads: int):
+    # The hooks of every monitor are kept out of the private attributes, so that every call reads all of them with a
+    # single dict lookup, like this: hooks = {id(monitor): Hooks(detector, spinner, profiler)}
+    hooks = {}
+
+    # Coroutines waiting in 'acquire_async' for a uid to be unlocked, like this:
+    # waiters = {(id(monitor), uid): [(loop1, future1), (loop2, future2), ...]}
+    waiters = {}
+    waiters_lock = Lock()
+
+    # The context managers returned by 'synchronized', made once per uid, max_threads and weight and then reused while
+    # they are among the CACHED_SECTIONS most recently used ones, like this:
+    # sections = {id(monitor): OrderedDict({(uid, max_threads, weight): section})}. They are dropped whenever a hook is
+    # enabled or disabled, and they don't keep their monitor alive, so that the cache doesn't either.
+    sections = {}
+
+    def lock_priority_code(self, uid: Union[str, int], order: int, total: int, max_threads: int,
+                           blocking: bool = True, weight: int = 1, ticket: object = None) -> bool:
         '''
         A private function that handles every use case. If total > 1, max_threads should be 1.
         :param self: A Monitor intance.
-        :param uid: Unique identifier for the code protector (for the associated semaphores).
+        :param uid: Unique identifier for the code protector (for the associated state).
         :param order: The priority of the code locked with this function's uid.
         :param total: The total number of pieces of code implied with this function's uid.
         :param max_threads: Maximum number of threads that can access the code simultaneously.
+        :param blocking: Whether to wait for the code to be available or to return False right away.
+        :param weight: Number of permits to take at once.
+        :param ticket: The place the caller keeps in the queue of the uid between tries that don't block.
+        :return: Whether the code was locked.
         '''
         assert order > 0
-        assert max_threads > 0
-        semaphores = p.semaphores
-        while True:
-            locker.acquire()
-            s = semaphores.get(uid)
-            if s is not None:
-                locker.release()
-                break
-            if total is None:
-                setup_locker = p.setup_priority_lockers.get(uid)
-                if setup_locker is None:
-                    setup_locker = Semaphore(0)
-                    p.setup_priority_lockers[uid] = setup_locker
-                locker.release()
-                setup_locker.acquire()
+        assert weight > 0
+        detector, spinner, profiler = hooks[id(self)]
+        if not blocking:
+            detector = None
+        if detector is not None:
+            detector.waiting_for(uid, order)
+        since = 0 if profiler is None else time_ns()
+        state = p.uids.get(uid, order, total, max_threads, blocking)
+        if state is None:
+            return False
+        if detector is not None and total is not None and total != state.total:
+            detector.misuse(f'uid {uid!r} was set up with total {state.total}, but order {order} was called '
+                            f'with total {total}')
+        if not blocking:
+            if not state.acquire(order, False, weight=weight, ticket=ticket):
+                return False
+        else:
+            if spinner is None:
+                state.acquire(order, weight=weight)
+            else:
+                spinner.acquire(uid, partial(state.acquire, order, weight=weight))
+            if detector is not None:
+                detector.acquired(uid, order)
+        if waiters and state.queue:
+            # The next one in the queue may be a coroutine that can take its permits now
+            wake_waiters((id(self), uid))
+        if profiler is not None:
+            profiler.acquired(uid, order, since)
+        return True
+
+    def unlock_code(self, uid: Union[str, int], weight: int = 1):
+        detector, spinner, profiler = hooks[id(self)]
+        if detector is not None:
+            detector.released(uid)
+            if p.uids.total(uid) is None:
+                detector.misuse(f'unlock_code was called for uid {uid!r}, which has never been locked')
+        if spinner is not None:
+            spinner.released(uid)
+        if profiler is not None:
+            profiler.released(uid)
+        p.uids.unlock(uid, weight)
+        if waiters:
+            wake_waiters((id(self), uid))
+
+    def wake_up(future: asyncio.Future):
+        if not future.done():
+            future.set_result(None)
+
+    def wake_waiters(key: tuple):
+        '''
+        :param key: The id of the monitor and the uid that was unlocked.
+        '''
+        with waiters_lock:
+            woken = waiters.pop(key, ())
+        for loop, future in woken:
+            # The coroutine of a closed loop can't be waiting anymore
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(wake_up, future)
+
+    class Section:
+        '''
+        The context manager of a uid when some hook is enabled, which goes through every check of 'lock_code'.
+        '''
+
+        __slots__ = ('monitor', 'uid', 'max_threads', 'weight')
+
+        def __init__(self, monitor, uid: Union[str, int], max_threads: int, weight: int):
+            self.monitor = ref(monitor)
+            self.uid = uid
+            self.max_threads = max_threads
+            self.weight = weight
+
+        def __enter__(self):
+            lock_priority_code(self.monitor(), uid=self.uid, order=1, total=1, max_threads=self.max_threads,
+                               weight=self.weight)
+
+        def __exit__(self, exc_type, exc_val, exc_tb):
+            unlock_code(self.monitor(), uid=self.uid, weight=self.weight)
+
+    class FastSection:
+        '''
+        The context manager of a uid when no hook is enabled, which goes straight to the state of the uid.
+        '''
+
+        __slots__ = ('key', 'state', 'acquire', 'release')
+
+        def __init__(self, monitor, uid: Union[str, int], state: UidState, weight: int):
+            if weight > state.capacity:
+                raise ValueError(f'a weight of {weight} can never be taken from a uid with {state.capacity} permits')
+            self.key = (id(monitor), uid)
+            self.state = state
+            if state.lock is not None:
+                self.acquire, self.release = state.lock.acquire, state.lock.release
             else:
-                assert order <= total
-                s = [Semaphore(max_threads)]
-                s.extend([Semaphore(0) for _ in range(total - 1)])
-                s = [tuple(s), 1]
-                semaphores[uid] = s
-                locker.release()
-                setup_locker = p.setup_priority_lockers.get(uid)
-                if setup_locker is not None:
-                    [setup_locker.release() for _ in range(total)]
-                    del p.setup_priority_lockers[uid]
-                break
-        s[0][order - 1].acquire()
-
-    def unlock_code(self, uid: Union[str, int]):
-        semaphores = p.semaphores
-        s = semaphores.get(uid)
-        total = len(s[0])
-        order = s[1]
-        s[1] = (s[1] + 1) % total
-        s[0][order % total].release()
+                self.acquire, self.release = partial(state.acquire, 1, weight=weight), partial(state.release, weight)
+
+        def __enter__(self):
+            self.acquire()
+            if waiters and self.state.queue:
+                wake_waiters(self.key)
+
+        def __exit__(self, exc_type, exc_val, exc_tb):
+            self.release()
+            if waiters:
+                wake_waiters(self.key)
+
+    def make_section(self, uid: Union[str, int], max_threads: int, weight: int):
+        assert weight > 0
+        if any(hooks[id(self)]):
+            return Section(self, uid, max_threads, weight)
+        return FastSection(self, uid, p.uids.get(uid, 1, 1, max_threads), weight)
+
+    def set_hooks(self, **changes: Any):
+        current = hooks[id(self)]
+        if 'detector' in changes and current.detector is not None:
+            current.detector.stop()
+        hooks[id(self)] = current._replace(**changes)
+        sections.pop(id(self), None)
 
     class Monitor(AbstractMonitor):
         '''
@@ -69,34 +184,110 @@ def Monitor():
         'lock_code()' and 'lock_priority_code()' since they share the same namespace.
         '''
 
-        def __init__(self):
+        def __init__(self, shards: int = 1):
+            '''
+            :param shards: Number of independent shards the uids are spread across, each one with its own lock.
+            '''
             p.register_instance(self)
 
-            # This attribute will store a tuple of semaphores per uid, so it'll be like:
-            # semaphores = {'uid1': [(s1,), order], 'uid2': [(s2, s3, s4), order], ...}
-            p.semaphores = {}
-            p.setup_priority_lockers = {}
+            # This attribute will store the state of every uid, which has the same size no matter its total
+            p.uids = UidStates() if shards == 1 else ShardedUidStates(shards)
+            hooks[id(self)] = NO_HOOKS
 
-        def lock_code(self, uid: Union[str, int], max_threads: int = 1):
-            lock_priority_code(self, uid=uid, order=1, total=1, max_threads=max_threads)
+        def lock_code(self, uid: Union[str, int], max_threads: int = 1, weight: int = 1):
+            lock_priority_code(self, uid=uid, order=1, total=1, max_threads=max_threads, weight=weight)
 
         def lock_priority_code(self, uid: Union[str, int], order: int, total: int = None):
             lock_priority_code(self, uid=uid, order=order, total=total, max_threads=1)
 
-        def unlock_code(self, uid: Union[str, int]):
-            unlock_code(self, uid=uid)
+        def unlock_code(self, uid: Union[str, int], weight: int = 1):
+            unlock_code(self, uid=uid, weight=weight)
+
+        def synchronized(self, uid: Union[str, int], max_threads: int = 1, weight: int = 1):
+            key = (uid, max_threads, weight)
+            cache = sections.get(id(self))
+            if cache is None:
+                cache = sections[id(self)] = OrderedDict()
+            section = cache.get(key)
+            if section is None:
+                section = cache[key] = make_section(self, uid, max_threads, weight)
+                if len(cache) > CACHED_SECTIONS:
+                    cache.popitem(last=False)
+            else:
+                try:
+                    cache.move_to_end(key)
+                except KeyError:
+                    # Another thread has just dropped it
+                    pass
+            return section
+
+        async def acquire_async(self, uid: Union[str, int], max_threads: int = 1, weight: int = 1):
+            loop = asyncio.get_running_loop()
+            key = (id(self), uid)
+            # The coroutine keeps its place in the queue of the uid between tries, like a thread that blocks
+            ticket = object()
+            try:
+                while True:
+                    waiter = (loop, loop.create_future())
+                    # The waiter is registered before trying, so that an unlock in between can't be missed
+                    with waiters_lock:
+                        waiters.setdefault(key, []).append(waiter)
+                    try:
+                        if lock_priority_code(self, uid=uid, order=1, total=1, max_threads=max_threads,
+                                              blocking=False, weight=weight, ticket=ticket):
+                            return
+                        await waiter[1]
+                    finally:
+                        # The waiter is still registered unless an unlock has woken it up
+                        with waiters_lock:
+                            pending = waiters.get(key, [])
+                            if waiter in pending:
+                                pending.remove(waiter)
+                                if not pending:
+                                    del waiters[key]
+            except BaseException:
+                p.uids.get(uid, 1, 1, max_threads).withdraw(ticket)
+                # The coroutine may have been the first one in the queue
+                if waiters:
+                    wake_waiters(key)
+                raise
+
+        def enable_deadlock_detection(self, timeout: float = 5, on_deadlock: Callable[[str], Any] = None):
+            set_hooks(self, detector=DeadlockDetector(timeout, on_deadlock))
+
+        def disable_deadlock_detection(self):
+            set_hooks(self, detector=None)
+
+        def enable_spinning(self, max_spins: int = 100, max_hold: float = 0.0001):
+            set_hooks(self, spinner=AdaptiveSpin(max_spins, max_hold))
+
+        def disable_spinning(self):
+            set_hooks(self, spinner=None)
+
+        def enable_profiling(self, capacity: int = 65536, directory: str = None) -> Profiler:
+            set_hooks(self, profiler=Profiler(capacity, directory))
+            return hooks[id(self)].profiler
+
+        def disable_profiling(self):
+            set_hooks(self, profiler=None)
 
         def __getstate__(self):
             state = dict(self.__dict__)
             state['private'] = p.getstate(self)
+            state['hooks'] = hooks[id(self)]
             return state
 
         def __setstate__(self, state):
             private = state.pop('private')
+            hooks[id(self)] = state.pop('hooks')
             p.setstate(self, private)
             self.__dict__ = state
 
         def __del__(self):
+            sections.pop(id(self), None)
+            detector = hooks.pop(id(self), NO_HOOKS).detector
+            if detector is not None:
+                detector.stop()
             p.delete(self)
 
     Monitor.__qualname__ = 'Monitor'
@@ -105,4 +296,4 @@ def Monitor():
 
 
 Monitor = Monitor()
-StaticMonitor = Monitor()
+StaticMonitor = Monitor(shards=16)
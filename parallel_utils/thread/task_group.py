@@ -0,0 +1,40 @@
+# /usr/bin/env python3
+# encoding:utf-8
+
+
+from concurrent.futures import Future
+from threading import Thread
+from typing import Any, Callable, Dict, Tuple
+
+from parallel_utils.common import AbstractTaskGroup
+
+
+def run_task(future: Future, func: Callable, args: Tuple[Any, ...], kwargs: Dict[str, Any]):
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        result = func(*args, **kwargs)
+    except BaseException as e:
+        future.set_exception(e)
+    else:
+        future.set_result(result)
+
+
+class TaskGroup(AbstractTaskGroup):
+    '''
+    A task group whose tasks run in their own threads.
+    Threads can't be stopped from outside, so cancelled tasks are only signalled through the 'cancelled' event of the
+    group, which long running tasks should check every now and then to return early.
+    For the same reason, the deadline of the group is only enforced on leaving it: tasks still running when it expires
+    are left behind in their daemon threads.
+    '''
+
+    stoppable = False
+
+    def start_task(self, func: Callable, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Future:
+        future = Future()
+        Thread(target=run_task, args=(future, func, args, kwargs), daemon=True).start()
+        return future
+
+    def cancel_tasks(self):
+        pass
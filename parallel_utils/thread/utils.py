@@ -2,6 +2,7 @@
 # encoding:utf-8
 
 
+import asyncio
 from concurrent.futures._base import Future
 from concurrent.futures.thread import ThreadPoolExecutor
 from typing import Any, Callable
@@ -19,3 +20,14 @@ def create_thread(func: Callable, *args: Any, **kwargs: Any) -> Future:
     future = tp.submit(func, *args, **kwargs)
     tp.shutdown(wait=False)
     return future
+
+
+async def create_thread_async(func: Callable, *args: Any, **kwargs: Any) -> Any:
+    '''
+    Calls a function in its own thread and awaits its result, without blocking the running event loop
+    :param func: The function to be called
+    :param args: The function arguments
+    :param kwargs: The function keyword arguments
+    :return: The function return value.
+    '''
+    return await asyncio.wrap_future(create_thread(func, *args, **kwargs))
@@ -43,6 +43,10 @@ install_requires = [
     "private-attrs",
 ]
 
+extras_require = {
+    "numpy": ["numpy"],
+}
+
 # https://pypi.org/classifiers/
 classifiers = [
     'Development Status :: 5 - Production/Stable',
@@ -62,6 +66,7 @@ setuptools.setup(
     classifiers=classifiers,
     description=description,
     download_url=url,
+    extras_require=extras_require,
     install_requires=install_requires,
     keywords=keywords,
     license=license,